@@ -1,9 +1,32 @@
-from flask import Flask, request, render_template, jsonify, send_file, session
+from flask import Flask, request, render_template, jsonify, send_file, session, Response, g
 import os
+import json
+import time
+import mimetypes
+import queue
+from concurrent.futures import Future
 from datetime import timedelta
+from urllib.parse import quote
+from werkzeug.security import safe_join
 from session_manager import SessionManager
+from session_store import RedisSessionStore
 from cleanup_scheduler import CleanupScheduler
 from downloader import UniversalDownloader
+from job_queue import DownloadJobQueue, PlatformLimiter
+from media_store import MediaStore
+from rate_limiter import PlatformGovernor
+from ydl_pool import YoutubeDLPool
+from transcode_pool import TranscodePool, chain
+from log_setup import configure_logging
+from zip_stream import stream_zip
+from lazy_import import yt_dlp, warm_up
+from reaper import FolderReaper
+from disk_budget import DiskBudget
+from prefetch import Prefetcher
+from metrics import REGISTRY, Callback, REQUEST_SECONDS, DOWNLOAD_SECONDS, ERRORS
+
+# Non-blocking logging (LOG_LEVEL=DEBUG shows per-update download progress)
+configure_logging(os.environ.get('LOG_LEVEL', 'INFO'))
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'your-super-secret-key-change-this-in-production'
@@ -15,25 +38,187 @@ DOWNLOAD_DIR = 'downloads'
 if not os.path.exists(DOWNLOAD_DIR):
     os.makedirs(DOWNLOAD_DIR)
 
+# Session storage: 'memory' (single process) or 'redis' (shared across workers/hosts).
+# Download jobs and progress still live in the worker process that queued them, so with several
+# workers /job-status, /job-stream and /download-progress need sticky routing (same session cookie,
+# same worker) in the load balancer in front of them, like Videos-Downloader/nginx.conf does
+SESSION_BACKEND = os.environ.get('SESSION_BACKEND', 'memory')
+if SESSION_BACKEND == 'redis':
+    SessionManager.configure_store(RedisSessionStore(url=os.environ.get('REDIS_URL', 'redis://localhost:6379/0')))
+    print("🗄️ Using Redis session store")
+
+# Download worker pool (caps concurrent downloads)
+DOWNLOAD_WORKERS = int(os.environ.get('DOWNLOAD_WORKERS', 4))
+DOWNLOAD_QUEUE_SIZE = int(os.environ.get('DOWNLOAD_QUEUE_SIZE', 100))
+
+# Progress streaming: max updates per connection, and keep-alive for quiet periods
+PROGRESS_STREAM_INTERVAL = float(os.environ.get('PROGRESS_STREAM_INTERVAL', 0.5))
+PROGRESS_STREAM_HEARTBEAT = 15
+# How often the download thread publishes progress
+PROGRESS_UPDATES_PER_SECOND = float(os.environ.get('PROGRESS_UPDATES_PER_SECOND', 4))
+
+# File serving: 'flask' sends files in-process (Range + sendfile), 'nginx' hands the transfer to
+# nginx with X-Accel-Redirect. That needs nginx proxying to the app with an internal X_ACCEL_PREFIX
+# location aliased to DOWNLOAD_DIR's absolute path (see Videos-Downloader/nginx.conf)
+SERVE_MODE = os.environ.get('SERVE_MODE', 'flask')
+X_ACCEL_PREFIX = os.environ.get('X_ACCEL_PREFIX', '/protected-downloads/')
+# Served files stay around this long after the last request, so dropped transfers can resume
+SERVE_GRACE_SECONDS = int(os.environ.get('SERVE_GRACE_SECONDS', 300))
+
+# Metadata cache for /fetch-info
+INFO_CACHE_TTL = int(os.environ.get('INFO_CACHE_TTL', 600))
+INFO_CACHE_SIZE = int(os.environ.get('INFO_CACHE_SIZE', 1024))
+# How long a fetch-info extraction can be reused by downloads of the same URL
+INFO_REUSE_TTL = int(os.environ.get('INFO_REUSE_TTL', 300))
+
+# Shared store of finished downloads (0 disables it)
+MEDIA_STORE_DIR = os.path.join(DOWNLOAD_DIR, '.store')
+MEDIA_STORE_MAX_GB = float(os.environ.get('MEDIA_STORE_MAX_GB', 10))
+
+# Upstream request rates per platform, e.g. RATE_LIMITS="instagram=0.2:2,tiktok=0.5:3" (requests/sec:burst)
+RATE_LIMITS = PlatformGovernor.parse_rates(os.environ.get('RATE_LIMITS'))
+
+# Disk space for session downloads (0 disables the budget). Downloads that don't fit stay queued (not on a
+# worker) up to DISK_ADMISSION_WAIT seconds; ones without a size estimate reserve DISK_DEFAULT_ESTIMATE_MB
+DISK_BUDGET_GB = float(os.environ.get('DISK_BUDGET_GB', 20))
+DISK_ADMISSION_WAIT = int(os.environ.get('DISK_ADMISSION_WAIT', 120))
+DISK_DEFAULT_ESTIMATE_MB = float(os.environ.get('DISK_DEFAULT_ESTIMATE_MB', 200))
+
+# Idle YoutubeDL instances kept warm per option set
+YDL_POOL_IDLE = int(os.environ.get('YDL_POOL_IDLE', 4))
+
+# ffmpeg transcodes run off the download workers: TRANSCODE_THREADS encoder threads per job and
+# as many jobs as fit in the cores (TRANSCODE_WORKERS=0), each niced and killed after TRANSCODE_TIMEOUT
+TRANSCODE_WORKERS = int(os.environ.get('TRANSCODE_WORKERS', 0))
+TRANSCODE_THREADS = int(os.environ.get('TRANSCODE_THREADS', 2))
+TRANSCODE_QUEUE_SIZE = int(os.environ.get('TRANSCODE_QUEUE_SIZE', 32))
+TRANSCODE_TIMEOUT = int(os.environ.get('TRANSCODE_TIMEOUT', 900))
+TRANSCODE_NICENESS = int(os.environ.get('TRANSCODE_NICENESS', 10))
+
+# Speculatively download the preselected format right after /fetch-info (0 workers disables it).
+# Prefetches only start while confirmed downloads aren't queueing and only for files up to PREFETCH_MAX_MB
+PREFETCH_WORKERS = int(os.environ.get('PREFETCH_WORKERS', 0))
+PREFETCH_QUEUE_SIZE = int(os.environ.get('PREFETCH_QUEUE_SIZE', 4))
+PREFETCH_MAX_MB = float(os.environ.get('PREFETCH_MAX_MB', 500))
+
+# Deleted folders are renamed into the graveyard and reaped in the background
+GRAVEYARD_DIR = os.path.join(DOWNLOAD_DIR, '.trash')
+REAP_MB_PER_SECOND = float(os.environ.get('REAP_MB_PER_SECOND', 200))
+REAP_FILES_PER_SECOND = int(os.environ.get('REAP_FILES_PER_SECOND', 2000))
+reaper = FolderReaper(
+    GRAVEYARD_DIR,
+    max_bytes_per_second=REAP_MB_PER_SECOND * 1024 ** 2,
+    max_files_per_second=REAP_FILES_PER_SECOND
+)
+reaper.start()
+SessionManager.configure_reaper(reaper)
+Callback('downloader_cleanup_freed_bytes_total', 'Bytes freed by deleting session folders',
+         lambda: reaper.stats()['bytes_freed'], kind='counter')
+
+def evict_session(session_id):
+    """Free a finished session's folder to make room for new downloads"""
+    if not SessionManager.get_session(session_id):
+        disk_budget.release(session_id)
+        return True
+    return SessionManager.cleanup_session(session_id) is True
+
 # Initialize components
-downloader = UniversalDownloader()
-scheduler = CleanupScheduler()
+disk_budget = DiskBudget(
+    int(DISK_BUDGET_GB * 1024 ** 3),
+    default_estimate=int(DISK_DEFAULT_ESTIMATE_MB * 1024 ** 2),
+    evict=evict_session
+) if DISK_BUDGET_GB > 0 else None
+SessionManager.configure_disk_budget(disk_budget)
+transcode_pool = TranscodePool(
+    workers=TRANSCODE_WORKERS or None,
+    threads_per_job=TRANSCODE_THREADS,
+    max_pending=TRANSCODE_QUEUE_SIZE,
+    timeout=TRANSCODE_TIMEOUT,
+    niceness=TRANSCODE_NICENESS
+)
+media_store = MediaStore(MEDIA_STORE_DIR, max_bytes=int(MEDIA_STORE_MAX_GB * 1024 ** 3)) if MEDIA_STORE_MAX_GB > 0 else None
+downloader = UniversalDownloader(
+    info_cache_ttl=INFO_CACHE_TTL,
+    info_cache_size=INFO_CACHE_SIZE,
+    info_reuse_ttl=INFO_REUSE_TTL,
+    media_store=media_store,
+    progress_updates_per_second=PROGRESS_UPDATES_PER_SECOND,
+    governor=PlatformGovernor(RATE_LIMITS),
+    ydl_pool=YoutubeDLPool(max_idle_per_key=YDL_POOL_IDLE),
+    disk_budget=disk_budget,
+    transcode_pool=transcode_pool
+)
+# Per-platform caps, e.g. PLATFORM_CONCURRENCY="youtube=6,instagram=1"
+platform_limiter = PlatformLimiter(PlatformLimiter.parse_limits(os.environ.get('PLATFORM_CONCURRENCY')))
+# Jobs for a platform at its limit, or waiting for disk space, wait in the queue, not on a worker
+download_queue = DownloadJobQueue(
+    workers=DOWNLOAD_WORKERS,
+    max_pending=DOWNLOAD_QUEUE_SIZE,
+    limiter=platform_limiter,
+    admission_wait=DISK_ADMISSION_WAIT
+)
+if disk_budget:
+    disk_budget.subscribe(download_queue.wake)
+prefetcher = Prefetcher(
+    downloader,
+    download_queue,
+    workers=PREFETCH_WORKERS,
+    max_pending=PREFETCH_QUEUE_SIZE,
+    max_bytes=int(PREFETCH_MAX_MB * 1024 ** 2),
+    disk_budget=disk_budget,
+    limiter=platform_limiter,
+    reaper=reaper
+) if PREFETCH_WORKERS > 0 else None
+scheduler = CleanupScheduler(interval_seconds=int(os.environ.get('CLEANUP_INTERVAL_SECONDS', 5)))
 scheduler.start()
 
-# Cleanup orphaned folders on startup 
+# Values owned by other components, read when /metrics is scraped
+Callback('downloader_active_downloads', 'Download jobs running now', download_queue.active_count)
+Callback('downloader_queued_downloads', 'Download jobs waiting for a worker', download_queue.queued_count)
+Callback('downloader_active_transcodes', 'ffmpeg transcodes running now', transcode_pool.active_count)
+Callback('downloader_queued_transcodes', 'Transcodes waiting for a worker', transcode_pool.queued_count)
+if prefetcher:
+    Callback('downloader_active_prefetches', 'Speculative downloads running now', prefetcher.active_count)
+Callback('downloader_live_sessions', 'Sessions not yet cleaned up', SessionManager.count_live_sessions)
+if disk_budget:
+    Callback('downloader_disk_used_bytes', 'Bytes accounted to session downloads', lambda: disk_budget.stats()['used_bytes'])
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_latency(response):
+    """Latency histogram for the routes that talk to the platforms"""
+    if request.endpoint in ('fetch_info', 'download') and 'request_started' in g:
+        REQUEST_SECONDS.observe(time.perf_counter() - g.request_started, request.endpoint, g.get('platform', 'unknown'))
+    return response
+
+# Import yt-dlp in the background instead of holding up startup
+warm_up(yt_dlp)
+
 # Cleanup orphaned folders on startup 
 def cleanup_orphaned_folders():
-    """Clean up any leftover folders from previous runs"""
-    if os.path.exists(DOWNLOAD_DIR):
-        for folder in os.listdir(DOWNLOAD_DIR):
-            folder_path = os.path.join(DOWNLOAD_DIR, folder)
-            if os.path.isdir(folder_path):
-                try:
-                    import shutil
-                    shutil. rmtree(folder_path)
-                    print(f"🧹 Cleaned orphaned folder: {folder}")
-                except Exception as e:
-                    print(f"❌ Error cleaning {folder}: {e}")
+    """Move leftover folders from previous runs to the graveyard.
+    
+    With a shared session store other workers may still be using theirs, so folders of
+    sessions that still exist are left alone.
+    """
+    if not os.path.exists(DOWNLOAD_DIR):
+        return
+    
+    for folder in os.listdir(DOWNLOAD_DIR):
+        folder_path = os.path.join(DOWNLOAD_DIR, folder)
+        # The shared media store outlives restarts
+        if folder_path in (MEDIA_STORE_DIR, GRAVEYARD_DIR) or not os.path.isdir(folder_path):
+            continue
+        if SessionManager.get_session(folder):
+            continue
+        try:
+            reaper.bury(folder_path)
+            print(f"🧹 Cleaned orphaned folder: {folder}")
+        except Exception as e:
+            print(f"❌ Error cleaning {folder}: {e}")
 
 cleanup_orphaned_folders()
 
@@ -80,8 +265,8 @@ def session_info():
     
     return jsonify({
         'session_id': session_id,
-        'state': session_data['state'],
-        'downloads': session_data['downloads']
+        'state': session_data.state.value,
+        'downloads': list(session_data.downloads)
     })
 
 # 🆕 NEW ROUTE:  Fetch video info without downloading
@@ -95,6 +280,7 @@ def fetch_info():
         
         if not url: 
             return jsonify({'status': 'error', 'message': 'URL is required'}), 400
+        g.platform = downloader.detect_platform(url)
         
         if not session_id:
             return jsonify({'status': 'error', 'message': 'Session expired.  Please refresh. '}), 401
@@ -105,11 +291,15 @@ def fetch_info():
         print(f"🔍 Fetching info for: {url}")
         
         # Fetch video info
-        result = downloader.fetch_video_info(url)
+        result = downloader.fetch_video_info(url, session_id)
         
         if result['status'] == 'success': 
             print(f"✅ Info fetched:  {result.get('title')}")
             
+            # Start on the likely download while the user is still looking at the quality list
+            if prefetcher:
+                prefetcher.start(session_id, url, result)
+            
             return jsonify(result)
         else:
             print(f"❌ Fetch failed: {result.get('message')}")
@@ -119,57 +309,59 @@ def fetch_info():
         print(f"❌ Server error: {str(e)}")
         return jsonify({'status':  'error', 'message':  'Your link is broken, please provide valid link'}), 500
 
-# MODIFIED: Download route now accepts format_id
-@app.route('/download', methods=['POST'])
-def download():
-    """Handle download requests with optional quality selection"""
+def admit_download(session_id, url, format_id):
+    """Disk admission for a queued /download, checked when a worker is about to take it"""
+    estimate = downloader.estimate_download_size(url, format_id)
+    
+    def admit():
+        # A prefetch of the same file already has its space
+        if prefetcher and prefetcher.is_prefetching(session_id, url, format_id):
+            return 0
+        return disk_budget.admit(session_id, estimate)
+    
+    return admit
+
+def run_download_job(url, format_id, session_id, download_folder, platform, admission=0):
+    """Run a single download on a worker thread and update the session.
+    
+    admission is the disk space reserved when the job left the queue (None if there was no room in time).
+    """
+    # Already downloading since fetch-info? Then this job just waits for that one
+    prefetched = prefetcher.claim(session_id, url, format_id) if prefetcher else None
+    if prefetched is not None:
+        started = time.perf_counter()
+        return chain(prefetched, lambda done: finish_download_job(
+            done.result(), url, session_id, download_folder, platform, started, admission or 0))
+    
+    if admission is None:
+        disk_budget.reject()
+        ERRORS.inc('download', 'disk_full')
+        SessionManager.set_state(session_id, SessionManager.STATE_ACTIVE)
+        SessionManager.cleanup_session(session_id, force=True)
+        return {'status': 'error', 'message': 'Server storage is full. Please try again in a few minutes'}
+    reserved = admission
+    
+    # Download content with selected quality
+    started = time.perf_counter()
+    try:
+        result = downloader.download_content(url, download_folder, session_id, format_id, hand_off=True)
+    except Exception as e:
+        print(f"❌ Download job error: {str(e)}")
+        result = {'status':  'error', 'message':  f'Server error: {str(e)}'}
+    
+    if isinstance(result, Future):
+        # Network phase is done; the job finishes when the transcode pool does, this worker moves on
+        return chain(result, lambda transcode: finish_download_job(
+            transcode.result(), url, session_id, download_folder, platform, started, reserved))
+    
+    return finish_download_job(result, url, session_id, download_folder, platform, started, reserved)
+
+def finish_download_job(result, url, session_id, download_folder, platform, started, reserved):
+    """Update the session (and disk budget) once a download's file is final"""
     try:
-        data = request.get_json()
-        url = data.get('url', '').strip()
-        format_id = data.get('format_id')  # 🆕 Quality format ID
-        session_id = session. get('session_id')
-        
-        if not url:
-            return jsonify({'status': 'error', 'message': 'URL is required'}), 400
-        
-        if not session_id:
-            return jsonify({'status': 'error', 'message': 'Session expired. Please refresh.'}), 401
-        
-        # Get session state
-        state = SessionManager.get_state(session_id)
-        
-        if not state:
-            return jsonify({'status': 'error', 'message': 'Session not found.  Please refresh.'}), 401
-        
-        # Handle different states
-        if state == SessionManager.STATE_DOWNLOADING:
-            return jsonify({'status': 'error', 'message': 'Download already in progress'}), 400
-        
-        elif state == SessionManager.STATE_COMPLETED:
-            # Auto-reset session for new download
-            print(f"♻️ Resetting completed session:  {session_id}")
-            SessionManager.reset_session(session_id)
-        
-        elif state == SessionManager.STATE_EXPIRED:
-            # Auto-renew expired session
-            print(f"🔄 Renewing expired session: {session_id}")
-            SessionManager.reset_session(session_id)
-        
-        # Update activity and set state to DOWNLOADING
-        SessionManager.update_activity(session_id)
-        SessionManager.set_state(session_id, SessionManager.STATE_DOWNLOADING)
-        
-        # Create download folder
-        download_folder = SessionManager.create_download_folder(session_id)
-        
-        # Detect platform
-        platform = downloader. detect_platform(url)
-        print(f"📥 Starting download:  {platform} - {url} (Format: {format_id})")
-        
-        # Download content with selected quality
-        result = downloader. download_content(url, download_folder, session_id, format_id)
-        
         if result['status'] == 'success': 
+            DOWNLOAD_SECONDS.observe(time.perf_counter() - started, platform)
+            
             # Clean up any invalid files that might have been created
             cleanup_invalid_files(download_folder)
             
@@ -177,19 +369,19 @@ def download():
             if not os.path.exists(result['filepath']):
                 SessionManager.set_state(session_id, SessionManager.STATE_ACTIVE)
                 SessionManager.cleanup_session(session_id, force=True)
-                return jsonify({
+                return {
                     'status': 'error',
                     'message': 'Download completed but file not found'
-                }), 400
+                }
             
             # Check file size (reject if too small - likely error)
             if result['filesize'] < 1024:  # Less than 1KB
                 SessionManager.set_state(session_id, SessionManager.STATE_ACTIVE)
                 SessionManager.cleanup_session(session_id, force=True)
-                return jsonify({
+                return {
                     'status': 'error',
                     'message':  'Downloaded file is too small - likely failed'
-                }), 400
+                }
             
             # Add download info to session
             download_info = {
@@ -208,14 +400,114 @@ def download():
             result['session_id'] = session_id
             
             print(f"✅ Download completed:  {result. get('filename')}")
-            return jsonify(result)
+            return result
         else:
             # Download failed - reset to ACTIVE
             SessionManager.set_state(session_id, SessionManager.STATE_ACTIVE)
             SessionManager.cleanup_session(session_id, force=True)
             
             print(f"❌ Download failed: {result.get('message')}")
-            return jsonify(result), 400
+            return result
+            
+    except Exception as e:
+        print(f"❌ Download job error: {str(e)}")
+        # Reset session on error
+        SessionManager.set_state(session_id, SessionManager.STATE_ACTIVE)
+        SessionManager.cleanup_session(session_id, force=True)
+        return {'status':  'error', 'message':  f'Server error: {str(e)}'}
+    finally:
+        if disk_budget:
+            # Replace the estimate with the real file size (failed downloads were already released)
+            if result and result['status'] == 'success':
+                disk_budget.settle(session_id, reserved, download_folder, result['filepath'], result['filesize'])
+            else:
+                disk_budget.settle(session_id, reserved, download_folder)
+
+# MODIFIED: Download route now queues a job and returns its id right away
+@app.route('/download', methods=['POST'])
+def download():
+    """Queue a download with optional quality selection"""
+    session_id = None
+    try:
+        data = request.get_json()
+        url = data.get('url', '').strip()
+        format_id = data.get('format_id')  # 🆕 Quality format ID
+        session_id = session. get('session_id')
+        
+        if not url:
+            return jsonify({'status': 'error', 'message': 'URL is required'}), 400
+        g.platform = downloader.detect_platform(url)
+        
+        if not session_id:
+            return jsonify({'status': 'error', 'message': 'Session expired. Please refresh.'}), 401
+        
+        # Get session state
+        state = SessionManager.get_state(session_id)
+        
+        if not state:
+            return jsonify({'status': 'error', 'message': 'Session not found.  Please refresh.'}), 401
+        
+        # Update activity (refreshes the timeout while the session is still ACTIVE)
+        SessionManager.update_activity(session_id)
+        
+        # Reject downloads that could never fit in the disk budget
+        if disk_budget and not disk_budget.fits(downloader.estimate_download_size(url, format_id)):
+            ERRORS.inc('download', 'too_large')
+            return jsonify({'status': 'error', 'message': 'This video is too large to download here. Try a lower quality'}), 507
+        
+        # Atomically claim the session, so two clicks (or two workers) can't both start a download
+        previous_state = SessionManager.compare_and_set_state(
+            session_id,
+            [SessionManager.STATE_ACTIVE, SessionManager.STATE_COMPLETED, SessionManager.STATE_EXPIRED],
+            SessionManager.STATE_DOWNLOADING
+        )
+        
+        # Handle different states
+        if not previous_state:
+            return jsonify({'status': 'error', 'message': 'Download already in progress'}), 400
+        
+        if previous_state != SessionManager.STATE_ACTIVE and prefetcher:
+            # Resetting the session deletes its folder, prefetch included
+            prefetcher.cancel(session_id)
+        
+        if previous_state == SessionManager.STATE_COMPLETED:
+            # Auto-reset session for new download
+            print(f"♻️ Resetting completed session:  {session_id}")
+            SessionManager.reset_session(session_id, SessionManager.STATE_DOWNLOADING)
+        
+        elif previous_state == SessionManager.STATE_EXPIRED:
+            # Auto-renew expired session
+            print(f"🔄 Renewing expired session: {session_id}")
+            SessionManager.reset_session(session_id, SessionManager.STATE_DOWNLOADING)
+        
+        # Create download folder
+        download_folder = SessionManager.create_download_folder(session_id)
+        
+        # Detect platform
+        platform = downloader. detect_platform(url)
+        print(f"📥 Queueing download:  {platform} - {url} (Format: {format_id})")
+        
+        # Hand the download to the worker pool
+        job = download_queue.submit(
+            run_download_job, url, format_id, session_id, download_folder, platform,
+            session_id=session_id,
+            platform=platform,
+            admit=admit_download(session_id, url, format_id) if disk_budget else None
+        )
+        
+        if not job:
+            ERRORS.inc('download', 'queue_full')
+            SessionManager.set_state(session_id, SessionManager.STATE_ACTIVE)
+            SessionManager.cleanup_session(session_id, force=True)
+            return jsonify({'status': 'error', 'message': 'Server is busy. Please try again in a moment'}), 503
+        
+        return jsonify({
+            'status': 'queued',
+            'message': 'Download queued',
+            'job_id': job.job_id,
+            'session_id': session_id,
+            'platform': platform
+        }), 202
             
     except Exception as e:
         print(f"❌ Server error: {str(e)}")
@@ -226,6 +518,71 @@ def download():
         return jsonify({'status':  'error', 'message':  f'Server error: {str(e)}'}), 500
 
 
+@app.route('/job-status/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Get status (and progress) of a queued download"""
+    try:
+        job = download_queue.get_job(job_id)
+        if not job:
+            return jsonify({'error': 'Job not found'}), 404
+        
+        # Verify session
+        current_session = session.get('session_id')
+        if current_session != job.session_id:
+            return jsonify({'error': 'Invalid session'}), 403
+        
+        status = job.to_dict()
+        status['progress'] = downloader. get_progress(job.session_id)
+        
+        return jsonify(status)
+        
+    except Exception as e:  
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/job-stream/<job_id>', methods=['GET'])
+def job_stream(job_id):
+    """Stream progress of a queued download as Server-Sent Events, ending with the job result"""
+    job = download_queue.get_job(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    # Verify session
+    current_session = session.get('session_id')
+    if current_session != job.session_id:
+        return jsonify({'error': 'Invalid session'}), 403
+    
+    # Wake the stream up when the job finishes, not only on progress changes
+    job.add_done_callback(lambda finished_job: downloader.notify_progress(finished_job.session_id))
+    
+    def generate():
+        version = -1
+        while not job.is_done():
+            new_version, progress = downloader.wait_for_progress(
+                job.session_id, version, PROGRESS_STREAM_HEARTBEAT, done=job.is_done)
+            
+            if job.is_done():
+                break
+            
+            if new_version == version:
+                # Nothing happened - keep proxies from closing the connection
+                yield ": keep-alive\n\n"
+                continue
+            
+            version = new_version
+            yield f"event: progress\ndata: {json.dumps(progress)}\n\n"
+            
+            # Coalesce bursts of updates into at most one per interval
+            time.sleep(PROGRESS_STREAM_INTERVAL)
+        
+        yield f"event: done\ndata: {json.dumps(job.to_dict())}\n\n"
+    
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+
 @app.route('/download-progress/<session_id>', methods=['GET'])
 def download_progress(session_id):
     """Get download progress for a session"""
@@ -258,27 +615,33 @@ def download_file(session_id, filename):
             return jsonify({'error': 'Session not found'}), 404
         
         # Find file
-        folder = session_data. get('download_folder')
+        folder = session_data.download_folder
         if not folder or not os.path.exists(folder):
             return jsonify({'error': 'Download folder not found'}), 404
         
-        filepath = os.path.join(folder, filename)
-        if not os.path.exists(filepath):
+        filepath = safe_join(folder, filename)
+        if not filepath or not os.path.exists(filepath):
             return jsonify({'error': 'File not found'}), 404
         
-        print(f"📤 Serving file: {filename}")
+        print(f"📤 Serving file: {filename} ({SERVE_MODE})")
         
-        # Send file
-        response = send_file(filepath, as_attachment=True, download_name=filename)
+        # Don't delete on close - the connection may drop and the client resume with a Range request.
+        # Each request pushes cleanup back by the grace period; the cleanup scheduler does the rest.
+        SessionManager.defer_cleanup(session_id, SERVE_GRACE_SECONDS)
+        if disk_budget:
+            disk_budget.mark_served(session_id)
         
-        # Cleanup after file is sent
-        @response.call_on_close
-        def cleanup():
-            print(f"🧹 Cleaning up after download: {session_id}")
-            SessionManager.cleanup_session(session_id, force=True)
-            SessionManager.reset_session(session_id)
+        if SERVE_MODE == 'nginx':
+            # nginx streams the file itself (sendfile, Range, no Python worker held)
+            relative_path = os.path.relpath(filepath, DOWNLOAD_DIR)
+            mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+            response = Response(status=200, mimetype=mimetype)
+            response.headers['X-Accel-Redirect'] = X_ACCEL_PREFIX + quote(relative_path)
+            response.headers['Content-Disposition'] = f"attachment; filename*=UTF-8''{quote(filename)}"
+            return response
         
-        return response
+        # Send file (conditional=True answers Range requests with 206, the WSGI server can use sendfile)
+        return send_file(os.path.abspath(filepath), as_attachment=True, download_name=filename, conditional=True)
         
     except Exception as e:
         print(f"❌ Error serving file: {str(e)}")
@@ -293,29 +656,143 @@ def cleanup_session_endpoint():
         if not session_id:  
             return jsonify({'status': 'error', 'message': 'No session found'}), 404
         
-        state = SessionManager.get_state(session_id)
+        if prefetcher:
+            prefetcher.cancel(session_id)
         
-        if state == SessionManager.STATE_DOWNLOADING:
-            # Don't cleanup if download in progress
+        # Skipped (atomically) if a download is in progress
+        if SessionManager.cleanup_session(session_id) is False:
             return jsonify({
                 'status': 'warning',
                 'message': 'Download in progress, cleanup skipped'
             })
         
-        # Cleanup
-        SessionManager.cleanup_session(session_id, force=True)
-        
         return jsonify({'status': 'success', 'message': 'Session cleaned up'})
         
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
+def run_bulk_item(url, download_folder, session_id, index, platform, admission=0):
+    """Download one bulk URL into its own staging folder, then move it into the session folder"""
+    # Disk space was reserved when the job left the queue, unless there was no room in time
+    if admission is None:
+        disk_budget.reject()
+        ERRORS.inc('download', 'disk_full')
+        return {'status': 'error', 'message': 'Server storage is full. Please try again in a few minutes'}
+    reserved = admission
+    
+    # Each item gets its own folder so concurrent downloads don't clean up each other's partial files
+    staging_folder = os.path.join(download_folder, f'.bulk-{index}')
+    os.makedirs(staging_folder, exist_ok=True)
+    
+    result = None
+    try:
+        started = time.perf_counter()
+        result = downloader.download_content(url, staging_folder, session_id)
+        
+        if result['status'] == 'success':
+            DOWNLOAD_SECONDS.observe(time.perf_counter() - started, platform)
+            cleanup_invalid_files(staging_folder)
+            
+            # Move into the session folder, avoiding name clashes with other items
+            filename = result['filename']
+            base, ext = os.path.splitext(filename)
+            suffix = 1
+            while True:
+                target = os.path.join(download_folder, filename)
+                try:
+                    # O_EXCL claims the name atomically across concurrent items
+                    os.close(os.open(target, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                    break
+                except FileExistsError:
+                    suffix += 1
+                    filename = f"{base} ({suffix}){ext}"
+
+            os.replace(result['filepath'], target)
+            result['filename'] = filename
+            result['filepath'] = target
+        
+        return result
+    finally:
+        reaper.bury(staging_folder)
+        if disk_budget:
+            if result and result['status'] == 'success':
+                disk_budget.settle(session_id, reserved, staging_folder, result['filepath'], result['filesize'])
+            else:
+                disk_budget.settle(session_id, reserved, staging_folder)
+
+def start_bulk_jobs(session_id, urls):
+    """Claim the session and queue every bulk URL.
+    
+    Returns (error_response, jobs); jobs is a list of (url, platform, job), job is None if the queue was full.
+    """
+    # Atomically claim the session for this batch
+    previous_state = SessionManager.compare_and_set_state(
+        session_id,
+        [SessionManager.STATE_ACTIVE, SessionManager.STATE_COMPLETED, SessionManager.STATE_EXPIRED],
+        SessionManager.STATE_DOWNLOADING
+    )
+    
+    if not previous_state:  
+        return (jsonify({'status': 'error', 'message': 'Download in progress'}), 400), None
+    
+    if previous_state in [SessionManager.STATE_COMPLETED, SessionManager.STATE_EXPIRED]:
+        SessionManager.reset_session(session_id, SessionManager.STATE_DOWNLOADING)
+    
+    download_folder = SessionManager.create_download_folder(session_id)
+    
+    # Queue every URL at once - the worker pool and platform limits decide how many run together
+    jobs = []
+    for index, url in enumerate(urls):
+        if url.strip():
+            platform = downloader. detect_platform(url. strip())
+            admit = None
+            if disk_budget:
+                estimate = downloader.estimate_download_size(url.strip())
+                admit = lambda estimate=estimate: disk_budget.admit(session_id, estimate)
+            job = download_queue.submit(
+                run_bulk_item, url. strip(), download_folder, session_id, index, platform,
+                session_id=session_id,
+                platform=platform,
+                admit=admit
+            )
+            jobs.append((url, platform, job))
+    
+    return None, jobs
+
+def finish_bulk_item(session_id, url, platform, job):
+    """Get a bulk item's result (waiting if needed) and record it in the session"""
+    if job:
+        result = job.wait()
+    else:
+        result = {'status': 'error', 'message': 'Server is busy. Please try again in a moment'}
+    
+    result['url'] = url
+    result['platform'] = platform
+    
+    if result['status'] == 'success':
+        SessionManager.add_download(session_id, {
+            'url': url,
+            'platform': platform,
+            'filename': result.get('filename'),
+            'filepath': result. get('filepath'),
+            'filesize': result.get('filesize', 0),
+            'status': 'completed'
+        })
+    
+    return result
+
+def get_bulk_urls():
+    """URLs from a JSON body or a form post (one per line)"""
+    data = request.get_json(silent=True)
+    if data is not None:
+        return data.get('urls', [])
+    return request.form.get('urls', '').splitlines()
+
 @app.route('/bulk-download', methods=['POST'])
 def bulk_download():
     """Handle bulk download requests"""
     try: 
-        data = request.get_json()
-        urls = data.get('urls', [])
+        urls = get_bulk_urls()
         session_id = session.get('session_id')
         
         if not urls:
@@ -324,37 +801,15 @@ def bulk_download():
         if not session_id:
             return jsonify({'status': 'error', 'message': 'Session expired'}), 401
         
-        # Check state
-        state = SessionManager.get_state(session_id)
-        
-        if state == SessionManager.STATE_DOWNLOADING:  
-            return jsonify({'status': 'error', 'message': 'Download in progress'}), 400
-        
-        if state in [SessionManager.STATE_COMPLETED, SessionManager.STATE_EXPIRED]:
-            SessionManager.reset_session(session_id)
+        error, jobs = start_bulk_jobs(session_id, urls)
+        if error:
+            return error
         
-        # Set to downloading
-        SessionManager.set_state(session_id, SessionManager.STATE_DOWNLOADING)
-        download_folder = SessionManager.create_download_folder(session_id)
-        
-        results = []
-        for url in urls:
-            if url.strip():
-                result = downloader. download_content(url. strip(), download_folder, session_id)
-                result['url'] = url
-                results.append(result)
-                
-                if result['status'] == 'success':
-                    SessionManager.add_download(session_id, {
-                        'url': url,
-                        'filename': result.get('filename'),
-                        'filepath': result. get('filepath'),
-                        'filesize': result.get('filesize', 0),
-                        'status': 'completed'
-                    })
+        # Collect results in request order
+        results = [finish_bulk_item(session_id, url, platform, job) for url, platform, job in jobs]
         
         # Clean invalid files after all downloads
-        cleanup_invalid_files(download_folder)
+        cleanup_invalid_files(SessionManager.get_session(session_id).download_folder)
         
         SessionManager.set_state(session_id, SessionManager.STATE_COMPLETED)
         
@@ -367,6 +822,63 @@ def bulk_download():
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
+@app.route('/bulk-download-zip', methods=['POST'])
+def bulk_download_zip():
+    """Bulk download streamed back as one ZIP, adding each file as soon as it finishes"""
+    try: 
+        urls = get_bulk_urls()
+        session_id = session.get('session_id')
+        
+        if not urls:
+            return jsonify({'status': 'error', 'message': 'URLs list is required'}), 400
+        
+        if not session_id:
+            return jsonify({'status': 'error', 'message': 'Session expired'}), 401
+        
+        error, jobs = start_bulk_jobs(session_id, urls)
+        if error:
+            return error
+        
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+    
+    def finished_entries():
+        """(arcname, filepath) for each successful download, in the order they finish"""
+        finished = queue.Queue()
+        for item in jobs:
+            job = item[2]
+            if job:
+                job.add_done_callback(lambda _, item=item: finished.put(item))
+            else:
+                finished.put(item)
+        
+        failures = []
+        try:
+            for _ in range(len(jobs)):
+                url, platform, job = finished.get()
+                result = finish_bulk_item(session_id, url, platform, job)
+                
+                if result['status'] == 'success':
+                    yield result['filename'], result['filepath']
+                else:
+                    failures.append(f"{url}: {result.get('message')}")
+            
+            if failures:
+                yield 'failed_downloads.txt', ('\n'.join(failures) + '\n').encode('utf-8')
+        finally:
+            SessionManager.set_state(session_id, SessionManager.STATE_COMPLETED)
+            SessionManager.defer_cleanup(session_id, SERVE_GRACE_SECONDS)
+    
+    return Response(stream_zip(finished_entries()), mimetype='application/zip', headers={
+        'Content-Disposition': 'attachment; filename="downloads.zip"',
+        'X-Accel-Buffering': 'no'
+    })
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus metrics"""
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
 if __name__ == '__main__':  
     # print("=" * 60)
     # print("🚀 UNIVERSAL SOCIAL MEDIA DOWNLOADER v2.0")
@@ -0,0 +1,99 @@
+"""Microbenchmark: cost of one yt-dlp progress callback.
+
+Compares the current UniversalDownloader.progress_hook with the previous
+implementation (new dict + string formatting + print on every chunk).
+
+    python benchmarks/bench_progress_hook.py [--calls N]
+"""
+import argparse
+import contextlib
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from downloader import UniversalDownloader  # noqa: E402
+
+
+def legacy_progress_hook(progress_data, d, session_id):
+    """The hook as it was before throttling (kept here for comparison)"""
+    if d['status'] == 'downloading':
+        if 'total_bytes' in d:
+            total = d['total_bytes']
+        elif 'total_bytes_estimate' in d:
+            total = d['total_bytes_estimate']
+        else:
+            total = None
+
+        if total:
+            downloaded = d.get('downloaded_bytes', 0)
+            percentage = int((downloaded / total) * 100)
+        else:
+            percentage = 0
+
+        speed = d.get('speed', 0)
+        if speed:
+            speed_mb = speed / (1024 * 1024)
+            speed_str = f"{speed_mb:.2f} MB/s"
+        else:
+            speed_str = "calculating..."
+
+        progress_data[session_id] = {
+            'status': 'downloading',
+            'percentage': percentage,
+            'downloaded': d.get('downloaded_bytes', 0),
+            'total': total,
+            'speed': speed_str,
+            'eta': d.get('eta', 0)
+        }
+
+        print(f"📊 Progress: {percentage}% | Speed: {speed_str}")
+
+
+def make_events(calls, total=500 * 1024 * 1024):
+    """Synthetic yt-dlp 'downloading' callbacks for one file"""
+    step = total // calls
+    return [{
+        'status': 'downloading',
+        'downloaded_bytes': i * step,
+        'total_bytes': total,
+        'speed': 12.5 * 1024 * 1024,
+        'eta': calls - i,
+    } for i in range(calls)]
+
+
+def time_hook(hook, events):
+    """Average nanoseconds per callback"""
+    start = time.perf_counter()
+    for d in events:
+        hook(d)
+    return (time.perf_counter() - start) / len(events) * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--calls', type=int, default=200000)
+    args = parser.parse_args()
+
+    events = make_events(args.calls)
+    session_id = 'bench-session'
+
+    # Legacy prints every call; send it to /dev/null so the terminal isn't the bottleneck
+    legacy_data = {}
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        legacy = time_hook(lambda d: legacy_progress_hook(legacy_data, d, session_id), events)
+
+    downloader = UniversalDownloader()
+    downloader.start_progress(session_id)
+    current = time_hook(lambda d: downloader.progress_hook(d, session_id), events)
+
+    print(f"callbacks:               {len(events):,}")
+    print(f"legacy progress_hook:    {legacy:8.0f} ns/call (stdout -> /dev/null)")
+    print(f"throttled progress_hook: {current:8.0f} ns/call")
+    print(f"speedup:                 {legacy / current:8.1f}x")
+    print(f"published updates:       {downloader.progress_versions[session_id]:,}")
+
+
+if __name__ == '__main__':
+    main()
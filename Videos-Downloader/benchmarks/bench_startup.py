@@ -0,0 +1,81 @@
+"""Startup benchmark: time from a fresh interpreter to the app serving its first request.
+
+Each run starts a new Python process in a scratch directory whose downloads/ folder
+is filled with orphaned session folders, as left behind by a crash.
+
+    python benchmarks/bench_startup.py [--runs N] [--orphans N] [--files N] [--file-kb N]
+"""
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# Runs inside the child process; writes "<import seconds> <first request seconds>" to the file
+# named in argv[1] (stdout is shared with the app's background threads, which print at any time)
+CHILD = f"""
+import sys, time
+start = time.perf_counter()
+sys.path.insert(0, {APP_DIR!r})
+import app
+imported = time.perf_counter()
+app.app.test_client().get('/')
+served = time.perf_counter()
+with open(sys.argv[1], 'w') as f:
+    f.write(f'{{imported - start}} {{served - start}}')
+"""
+
+
+def make_orphans(download_dir, orphans, files, file_kb):
+    """Fill downloads/ with leftover session folders"""
+    payload = os.urandom(file_kb * 1024)
+    for i in range(orphans):
+        folder = os.path.join(download_dir, f"orphan-{i}")
+        os.makedirs(folder)
+        for j in range(files):
+            with open(os.path.join(folder, f"part-{j}.mp4"), 'wb') as f:
+                f.write(payload)
+
+
+def run_once(workdir):
+    """Start the app in a fresh process, returns (import seconds, first request seconds)"""
+    env = dict(os.environ, LOG_LEVEL='WARNING')
+    result_path = os.path.join(workdir, 'startup-result')
+    subprocess.run([sys.executable, '-c', CHILD, result_path], cwd=workdir, env=env,
+                   capture_output=True, text=True, check=True)
+    with open(result_path) as f:
+        imported, served = f.read().split()
+    return float(imported), float(served)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--orphans', type=int, default=200)
+    parser.add_argument('--files', type=int, default=20)
+    parser.add_argument('--file-kb', type=int, default=256)
+    args = parser.parse_args()
+
+    imports, firsts = [], []
+    for _ in range(args.runs):
+        workdir = tempfile.mkdtemp(prefix='bench-startup-')
+        try:
+            make_orphans(os.path.join(workdir, 'downloads'), args.orphans, args.files, args.file_kb)
+            imported, served = run_once(workdir)
+            imports.append(imported)
+            firsts.append(served)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    orphan_mb = args.orphans * args.files * args.file_kb / 1024
+    print(f"orphaned data per run:   {args.orphans} folders, {orphan_mb:,.0f} MB")
+    print(f"import app (median):     {statistics.median(imports) * 1000:8.0f} ms  (min {min(imports) * 1000:.0f})")
+    print(f"first request (median):  {statistics.median(firsts) * 1000:8.0f} ms  (min {min(firsts) * 1000:.0f})")
+
+
+if __name__ == '__main__':
+    main()
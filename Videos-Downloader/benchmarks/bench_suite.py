@@ -0,0 +1,183 @@
+"""Offline benchmark suite: the downloader and the Flask routes against a local media server.
+
+Nothing leaves localhost. A stub yt-dlp extractor (benchmarks/yt_dlp_plugins) maps
+https://bench.invalid/... URLs to synthetic progressive and fragmented media served by
+benchmarks/media_server.py.
+
+    python benchmarks/bench_suite.py [--iterations N] [--sizes-mb 1,16,64] [--only fetch,download,routes]
+
+Reports ops/sec, p50/p99 latency and the process's peak RSS after each scenario.
+"""
+import argparse
+import contextlib
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.join(BENCH_DIR, '..')
+# yt-dlp finds the stub extractor through its plugin path, so this has to come before it's imported
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, APP_DIR)
+
+from media_server import MediaServer  # noqa: E402
+
+BENCH_URL = 'https://bench.invalid'
+# The stub isn't a real platform, so its requests aren't rate limited
+UNLIMITED = 'unknown=1000000:1000000'
+
+# Pooled YoutubeDL instances keep the stdout they were created with, so this stays open
+DEVNULL = open(os.devnull, 'w')
+# Results go here while everything else is quieted
+REPORT = sys.stdout
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))]
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+@contextlib.contextmanager
+def quiet():
+    """The app prints a lot; send it to /dev/null so the terminal isn't what gets measured"""
+    with contextlib.redirect_stdout(DEVNULL), contextlib.redirect_stderr(DEVNULL):
+        yield
+
+
+def run(name, op, iterations, bytes_per_op=0):
+    """Time op(i) for each iteration and print one result row"""
+    # One untimed call first, so one-off imports and pool warm-up don't land in p99
+    op(-1)
+
+    latencies = []
+    started = time.perf_counter()
+    for i in range(iterations):
+        op_started = time.perf_counter()
+        op(i)
+        latencies.append(time.perf_counter() - op_started)
+    elapsed = time.perf_counter() - started
+
+    throughput = f"{bytes_per_op * iterations / elapsed / 1024 ** 2:8.1f}" if bytes_per_op else f"{'-':>8}"
+    print(f"{name:<40} {iterations / elapsed:9.1f} {percentile(latencies, 50) * 1000:9.1f} "
+          f"{percentile(latencies, 99) * 1000:9.1f} {throughput} {peak_rss_mb():9.0f}", file=REPORT, flush=True)
+
+
+def expect_success(result):
+    if result.get('status') != 'success':
+        raise RuntimeError(f"benchmark operation failed: {result.get('message')}")
+    return result
+
+
+def new_downloader():
+    from downloader import UniversalDownloader
+    from rate_limiter import PlatformGovernor
+
+    return UniversalDownloader(governor=PlatformGovernor(PlatformGovernor.parse_rates(UNLIMITED)))
+
+
+def bench_fetch(iterations):
+    downloader = new_downloader()
+    url = f'{BENCH_URL}/progressive/{1024 * 1024}'
+
+    # Distinct query strings keep every lookup a cache miss
+    run('fetch_video_info (cold)', lambda i: expect_success(downloader.fetch_video_info(f'{url}?n={i}')), iterations)
+
+    expect_success(downloader.fetch_video_info(url))
+    run('fetch_video_info (cached)', lambda i: expect_success(downloader.fetch_video_info(url)), iterations)
+
+
+def bench_download(iterations, sizes, workdir):
+    downloader = new_downloader()
+
+    for kind in ('progressive', 'fragmented'):
+        for size in sizes:
+            def download(i, kind=kind, size=size):
+                folder = os.path.join(workdir, f'{kind}-{size}-{i}')
+                os.makedirs(folder)
+                try:
+                    expect_success(downloader.download_content(f'{BENCH_URL}/{kind}/{size}', folder, f'bench-{i}'))
+                finally:
+                    shutil.rmtree(folder)
+
+            run(f'download_content {kind} {size // 1024 ** 2} MB', download, iterations, bytes_per_op=size)
+
+
+def bench_routes(iterations, sizes, workdir):
+    # The app keeps downloads/ relative to the working directory
+    os.chdir(workdir)
+    import app as app_module
+
+    flask_app = app_module.app
+
+    def new_client():
+        client = flask_app.test_client()
+        client.get('/')
+        return client
+
+    client = new_client()
+    url = f'{BENCH_URL}/progressive/{1024 * 1024}'
+    client.post('/fetch-info', json={'url': url})
+    run('POST /fetch-info (cached)', lambda i: client.post('/fetch-info', json={'url': url}), iterations * 10)
+
+    for size in sizes:
+        def full_flow(i, size=size):
+            client = new_client()
+            url = f'{BENCH_URL}/progressive/{size}?n={i}'
+            expect_success(client.post('/fetch-info', json={'url': url}).get_json())
+
+            queued = client.post('/download', json={'url': url, 'format_id': '720p'}).get_json()
+            job = app_module.download_queue.get_job(queued['job_id'])
+            job.wait(120)
+            result = expect_success(job.result)
+
+            response = client.get(f"/download-file/{queued['session_id']}/{result['filename']}")
+            received = sum(len(chunk) for chunk in response.response)
+            response.close()
+            if received != size:
+                raise RuntimeError(f"served {received} of {size} bytes")
+
+        run(f'routes fetch+download+serve {size // 1024 ** 2} MB', full_flow, iterations, bytes_per_op=size)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=10, help='iterations per download scenario (fetch runs 10x)')
+    parser.add_argument('--sizes-mb', default='1,16,64')
+    parser.add_argument('--only', default='fetch,download,routes')
+    args = parser.parse_args()
+
+    sizes = [int(float(size) * 1024 * 1024) for size in args.sizes_mb.split(',')]
+    scenarios = set(args.only.split(','))
+
+    # Keep the app's own stores out of the way: every download should really download
+    os.environ.setdefault('MEDIA_STORE_MAX_GB', '0')
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    os.environ.setdefault('RATE_LIMITS', UNLIMITED)
+
+    workdir = tempfile.mkdtemp(prefix='bench-suite-')
+    try:
+        with MediaServer() as server:
+            os.environ['BENCH_MEDIA_SERVER'] = server.base_url
+
+            print(f"{'scenario':<40} {'ops/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'MB/s':>8} {'RSS MB':>9}")
+            with quiet():
+                if 'fetch' in scenarios:
+                    bench_fetch(args.iterations * 10)
+                if 'download' in scenarios:
+                    bench_download(args.iterations, sizes, workdir)
+                if 'routes' in scenarios:
+                    bench_routes(args.iterations, sizes, workdir)
+    finally:
+        os.chdir(APP_DIR)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,221 @@
+"""Load test: thousands of concurrent browser sessions against app.py, fully offline.
+
+Each virtual user runs the whole session lifecycle through the Flask test client:
+open the page (new session), fetch-info, download, poll job status, download the file,
+then clean up (a fraction of users abandon the session instead and leave it to the
+CleanupScheduler, which runs alongside with a short interval). Downloads come from the
+local media server through the stub extractor used by bench_suite.py.
+
+    python benchmarks/load_test.py [--sessions N] [--concurrency N] [--size-kb N] [--abandon 0.2]
+
+Reports throughput, per-step tail latency, failures (including exceptions raised inside
+the cleanup job) and the peak number of live sessions.
+"""
+import argparse
+import logging
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+import traceback
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from bench_suite import BENCH_URL, REPORT, UNLIMITED, peak_rss_mb, percentile, quiet
+from media_server import MediaServer
+
+STEPS = ('open', 'fetch-info', 'download', 'wait', 'download-file', 'cleanup')
+
+
+class _ErrorCounter(logging.Handler):
+    """Collects errors logged by APScheduler (exceptions raised inside the cleanup job)"""
+
+    def __init__(self):
+        super().__init__(level=logging.ERROR)
+        self.errors = Counter()
+
+    def emit(self, record):
+        if record.exc_info:
+            error = record.exc_info[1]
+            self.errors[f"{type(error).__name__}: {error}"] += 1
+        else:
+            self.errors[record.getMessage()] += 1
+
+
+class LoadTest:
+    def __init__(self, app_module, args):
+        self.app_module = app_module
+        self.args = args
+        self.latencies = defaultdict(list)  # step -> seconds
+        self.failures = Counter()  # (step, reason) -> count
+        self.completed = 0
+        self._lock = threading.Lock()
+
+    def _fail(self, step, reason):
+        with self._lock:
+            self.failures[(step, reason)] += 1
+
+    def _timed(self, step, func):
+        started = time.perf_counter()
+        result = func()
+        self.latencies[step].append(time.perf_counter() - started)
+        return result
+
+    def user(self, index):
+        """One browser session, start to finish"""
+        step = 'open'
+        try:
+            client = self.app_module.app.test_client()
+            self._timed('open', lambda: client.get('/'))
+
+            url = f'{BENCH_URL}/progressive/{self.args.size_kb * 1024}?n={index % self.args.url_pool}'
+
+            step = 'fetch-info'
+            response = self._timed(step, lambda: client.post('/fetch-info', json={'url': url}))
+            if response.status_code != 200:
+                return self._fail(step, f"HTTP {response.status_code}: {response.get_json().get('message')}")
+
+            step = 'download'
+            response = self._timed(step, lambda: client.post('/download', json={'url': url, 'format_id': '360p'}))
+            if response.status_code != 202:
+                return self._fail(step, f"HTTP {response.status_code}: {response.get_json().get('message')}")
+            queued = response.get_json()
+
+            # Poll like the page's fallback does
+            step = 'wait'
+            started = time.perf_counter()
+            while True:
+                status = client.get(f"/job-status/{queued['job_id']}").get_json()
+                if status.get('status') in ('completed', 'failed') or 'error' in status:
+                    break
+                time.sleep(self.args.poll_interval)
+            self.latencies[step].append(time.perf_counter() - started)
+            if status.get('status') != 'completed':
+                return self._fail(step, (status.get('result') or {}).get('message') or status.get('error'))
+
+            step = 'download-file'
+            filename = status['result']['filename']
+
+            def fetch_file():
+                response = client.get(f"/download-file/{queued['session_id']}/{filename}")
+                received = sum(len(chunk) for chunk in response.response)
+                response.close()
+                return response.status_code, received
+
+            code, received = self._timed(step, fetch_file)
+            if code != 200:
+                return self._fail(step, f"HTTP {code}")
+
+            if random.random() >= self.args.abandon:
+                step = 'cleanup'
+                response = self._timed(step, lambda: client.post('/cleanup-session'))
+                if response.status_code != 200:
+                    return self._fail(step, f"HTTP {response.status_code}")
+
+            with self._lock:
+                self.completed += 1
+
+        except Exception as e:
+            self._fail(step, f"{type(e).__name__}: {e}")
+            if self.args.verbose:
+                traceback.print_exc(file=REPORT)
+
+
+def monitor(test, session_manager, stop, samples):
+    """Sample live sessions while the test runs, with a progress line every few seconds"""
+    started = time.perf_counter()
+    ticks = 0
+    while not stop.wait(0.5):
+        samples.append(session_manager.count_live_sessions())
+        ticks += 1
+        if ticks % 10 == 0:
+            print(f"  {time.perf_counter() - started:5.0f}s  completed {test.completed:6}  "
+                  f"failed {sum(test.failures.values()):5}  live sessions {samples[-1]:6}", file=REPORT, flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sessions', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=200)
+    parser.add_argument('--size-kb', type=int, default=256)
+    parser.add_argument('--url-pool', type=int, default=100, help='distinct URLs (repeats hit the info cache)')
+    parser.add_argument('--abandon', type=float, default=0.2, help='fraction of users that never call cleanup')
+    parser.add_argument('--session-timeout', type=int, default=30)
+    parser.add_argument('--cleanup-interval', type=int, default=1)
+    parser.add_argument('--poll-interval', type=float, default=1.0, help='the page polls job status once a second')
+    parser.add_argument('--drain-seconds', type=float, help='time for the scheduler to expire abandoned sessions '
+                                                             '(default: just over the session timeout)')
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+    if args.drain_seconds is None:
+        args.drain_seconds = args.session_timeout + 2 * args.cleanup_interval + 1
+
+    os.environ.setdefault('MEDIA_STORE_MAX_GB', '0')
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    os.environ.setdefault('RATE_LIMITS', UNLIMITED)
+    os.environ.setdefault('DOWNLOAD_QUEUE_SIZE', str(args.sessions))
+    os.environ['CLEANUP_INTERVAL_SECONDS'] = str(args.cleanup_interval)
+    # Served sessions normally linger for minutes; let them expire within the run
+    os.environ.setdefault('SERVE_GRACE_SECONDS', str(args.session_timeout))
+
+    scheduler_errors = _ErrorCounter()
+    logging.getLogger('apscheduler').addHandler(scheduler_errors)
+
+    workdir = tempfile.mkdtemp(prefix='load-test-')
+    app_dir = os.getcwd()
+    try:
+        with MediaServer() as server, quiet():
+            os.environ['BENCH_MEDIA_SERVER'] = server.base_url
+            os.chdir(workdir)
+
+            import app as app_module
+            from session_manager import SessionManager
+            SessionManager.TIMEOUT_SECONDS = args.session_timeout
+
+            test = LoadTest(app_module, args)
+            stop = threading.Event()
+            live_samples = []
+            threading.Thread(target=monitor, args=(test, SessionManager, stop, live_samples), daemon=True).start()
+
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+                list(pool.map(test.user, range(args.sessions)))
+            elapsed = time.perf_counter() - started
+
+            # Abandoned sessions are the scheduler's job
+            time.sleep(args.drain_seconds)
+            stop.set()
+            remaining = SessionManager.count_live_sessions()
+
+        print(f"sessions:             {args.sessions} ({args.concurrency} concurrent, "
+              f"{args.abandon:.0%} abandoned)", file=REPORT)
+        print(f"completed:            {test.completed} in {elapsed:.1f}s "
+              f"({test.completed / elapsed:.1f} sessions/s)", file=REPORT)
+        print(f"peak live sessions:   {max(live_samples, default=0)}  "
+              f"(left after {args.drain_seconds:.0f}s drain: {remaining})", file=REPORT)
+        print(f"peak RSS:             {peak_rss_mb():.0f} MB", file=REPORT)
+        print(file=REPORT)
+        print(f"{'step':<16} {'count':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}", file=REPORT)
+        for step in STEPS:
+            samples = test.latencies.get(step)
+            if samples:
+                print(f"{step:<16} {len(samples):7} {percentile(samples, 50) * 1000:9.1f} "
+                      f"{percentile(samples, 95) * 1000:9.1f} {percentile(samples, 99) * 1000:9.1f} "
+                      f"{max(samples) * 1000:9.1f}", file=REPORT)
+
+        print(file=REPORT)
+        print(f"failures:             {sum(test.failures.values())}", file=REPORT)
+        for (step, reason), count in test.failures.most_common(10):
+            print(f"  {count:6} {step}: {reason}", file=REPORT)
+        print(f"cleanup job errors:   {sum(scheduler_errors.errors.values())}", file=REPORT)
+        for reason, count in scheduler_errors.errors.most_common(10):
+            print(f"  {count:6} {reason}", file=REPORT)
+    finally:
+        os.chdir(app_dir)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
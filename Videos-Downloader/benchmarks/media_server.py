@@ -0,0 +1,94 @@
+"""Local HTTP server with synthetic media, for benchmarks that must not touch the network.
+
+    /progressive/<bytes>.mp4               one file (Range supported)
+    /fragmented/<bytes>/seg-<n>.m4s        fixed-size fragments of a <bytes> stream
+
+The content is filler; yt-dlp's native downloaders don't inspect it.
+"""
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FRAGMENT_SIZE = 1024 * 1024
+_BLOCK = bytes(range(256)) * 4096  # 1 MB of filler, written repeatedly
+
+PROGRESSIVE_PATH = re.compile(r'^/progressive/(\d+)\.mp4$')
+FRAGMENT_PATH = re.compile(r'^/fragmented/(\d+)/seg-(\d+)\.m4s$')
+
+
+def fragment_count(size):
+    return max(1, -(-size // FRAGMENT_SIZE))
+
+
+class _MediaHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, like a real CDN
+
+    def do_GET(self):
+        path = self.path.split('?', 1)[0]
+
+        match = PROGRESSIVE_PATH.match(path)
+        if match:
+            return self._send_filler(int(match.group(1)))
+
+        match = FRAGMENT_PATH.match(path)
+        if match:
+            size, index = int(match.group(1)), int(match.group(2))
+            if index >= fragment_count(size):
+                return self.send_error(404)
+            return self._send_filler(min(FRAGMENT_SIZE, size - index * FRAGMENT_SIZE))
+
+        self.send_error(404)
+
+    def _send_filler(self, size):
+        start, end = 0, size - 1
+        range_header = self.headers.get('Range')
+        match = re.match(r'bytes=(\d+)-(\d*)', range_header or '')
+        if match:
+            start = int(match.group(1))
+            end = min(int(match.group(2)), end) if match.group(2) else end
+            if start > end:
+                self.send_response(416)
+                self.send_header('Content-Range', f'bytes */{size}')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+        else:
+            self.send_response(200)
+
+        length = end - start + 1
+        self.send_header('Content-Type', 'video/mp4')
+        self.send_header('Content-Length', str(length))
+        self.send_header('Accept-Ranges', 'bytes')
+        self.end_headers()
+
+        while length > 0:
+            chunk = _BLOCK[:min(length, len(_BLOCK))]
+            self.wfile.write(chunk)
+            length -= len(chunk)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MediaServer:
+    """ThreadingHTTPServer on a free localhost port, run on a background thread"""
+
+    def __init__(self, host='127.0.0.1', port=0):
+        self.httpd = ThreadingHTTPServer((host, port), _MediaHandler)
+        self.httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='media-server', daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,57 @@
+"""Stub yt-dlp extractor for the benchmarks (loaded through yt-dlp's plugin mechanism).
+
+Handles https://bench.invalid/<progressive|fragmented>/<bytes>[?anything] without any
+network request, pointing the formats at the local MediaServer in BENCH_MEDIA_SERVER.
+"""
+import os
+
+from yt_dlp.extractor.common import InfoExtractor
+
+
+class BenchMediaIE(InfoExtractor):
+    IE_NAME = 'bench:media'
+    _VALID_URL = r'https?://bench\.invalid/(?P<kind>progressive|fragmented)/(?P<size>\d+)'
+
+    FRAGMENT_SIZE = 1024 * 1024
+
+    def _real_extract(self, url):
+        kind, size = self._match_valid_url(url).group('kind', 'size')
+        size = int(size)
+        server = os.environ['BENCH_MEDIA_SERVER']
+        video_id = f'{kind}-{size}'
+
+        base = {
+            'ext': 'mp4',
+            'vcodec': 'avc1.64001f',
+            'acodec': 'mp4a.40.2',
+            'filesize': size,
+        }
+
+        if kind == 'progressive':
+            formats = [
+                dict(base, format_id=f'{height}p', height=height, width=height * 16 // 9,
+                     url=f'{server}/progressive/{size}.mp4')
+                for height in (360, 720, 1080)
+            ]
+        else:
+            count = max(1, -(-size // self.FRAGMENT_SIZE))
+            formats = [dict(
+                base,
+                format_id='720p-dash',
+                height=720,
+                width=1280,
+                protocol='http_dash_segments',
+                url=f'{server}/fragmented/{size}/',
+                fragment_base_url=f'{server}/fragmented/{size}/',
+                fragments=[{'path': f'seg-{i}.m4s'} for i in range(count)],
+            )]
+
+        return {
+            'id': video_id,
+            'title': f'Bench {kind} {size}',
+            'duration': 60,
+            'uploader': 'bench',
+            'view_count': 0,
+            'thumbnail': f'{server}/progressive/1024.mp4',
+            'formats': formats,
+        }
@@ -1,11 +1,16 @@
 from apscheduler.schedulers.background import BackgroundScheduler
 from session_manager import SessionManager
 import atexit
+import logging
+
+# APScheduler logs every run at INFO, which is noise at a few-second interval
+logging.getLogger('apscheduler').setLevel(logging.WARNING)
 
 class CleanupScheduler:
     """Background job scheduler for session cleanup"""
     
-    def __init__(self):
+    def __init__(self, interval_seconds=5):
+        self.interval_seconds = interval_seconds
         self.scheduler = BackgroundScheduler()
         self.scheduler.start()
         
@@ -14,17 +19,17 @@ class CleanupScheduler:
     
     def start(self):
         """Start cleanup jobs"""
-        # Run cleanup every 2 minutes
+        # Cheap to run often: only sessions whose deadline has passed are looked at
         self.scheduler.add_job(
             func=self.cleanup_expired_sessions,
             trigger='interval',
-            minutes=2,
+            seconds=self.interval_seconds,
             id='cleanup_job',
             name='Cleanup expired sessions',
             replace_existing=True
         )
         
-        print("🧹 Cleanup scheduler started (runs every 2 minutes)")
+        print(f"🧹 Cleanup scheduler started (runs every {self.interval_seconds} seconds)")
     
     @staticmethod
     def cleanup_expired_sessions():
@@ -39,6 +44,6 @@ class CleanupScheduler:
                 if success:
                     print(f"  ✅ Cleaned session:  {session_id}")
                 else:
-                    print(f"  ⏳ Skipped (download in progress): {session_id}")
-        else:
-            print("✨ No expired sessions to clean")
\ No newline at end of file
+                    # Check again later, it has left the expiry index
+                    SessionManager.extend_timeout(session_id, minutes=10)
+                    print(f"  ⏳ Skipped (download in progress): {session_id}")
\ No newline at end of file
@@ -0,0 +1,189 @@
+import os
+import threading
+import time
+
+
+class _SessionUsage:
+    """Bytes one session has on disk (or has been promised)"""
+
+    __slots__ = ('reserved', 'in_flight', 'settled', 'completed_at', 'served')
+
+    def __init__(self):
+        self.reserved = 0  # Estimates of downloads still running
+        self.in_flight = {}  # path -> bytes reported by progress_hook
+        self.settled = {}  # path -> size of finished files
+        self.completed_at = None
+        self.served = False
+
+    def total(self):
+        # While downloading, count whichever is bigger: the estimate or what has actually arrived
+        return max(self.reserved, sum(self.in_flight.values())) + sum(self.settled.values())
+
+
+class DiskBudget:
+    """Byte accounting for downloads/ and admission of new downloads against a fixed budget.
+
+    Downloads reserve their estimated size before starting; progress_hook totals and final
+    file sizes replace the estimate as they become known. When a download doesn't fit,
+    finished sessions are evicted (already-served first, then oldest completed first) and
+    otherwise it isn't admitted; subscribers hear whenever space frees up, to try again.
+    """
+
+    def __init__(self, max_bytes, default_estimate=200 * 1024 * 1024, evict=None):
+        self.max_bytes = max_bytes
+        self.default_estimate = default_estimate
+        # Called with a session_id to free its folder; should end in release(session_id)
+        self.evict = evict
+
+        self._sessions = {}
+        self._total = 0
+        self._lock = threading.Lock()
+        self._listeners = []
+        self.evictions = 0
+        self.rejections = 0
+
+    def _usage(self, session_id):
+        usage = self._sessions.get(session_id)
+        if usage is None:
+            usage = self._sessions[session_id] = _SessionUsage()
+        return usage
+
+    def _change(self, usage, update):
+        """Apply update to a session and keep the running total in step (lock held)"""
+        before = usage.total()
+        update()
+        self._total += usage.total() - before
+
+    def fits(self, estimate):
+        """Could a download of this size ever fit, if everything else were evicted?"""
+        return (estimate or self.default_estimate) <= self.max_bytes
+
+    def admit(self, session_id, estimate):
+        """Reserve room for a download, evicting finished sessions if needed (never waits).
+
+        Returns the reserved size, or None if there's no room right now.
+        """
+        estimate = estimate or self.default_estimate
+        evicted = set()
+
+        while True:
+            with self._lock:
+                shortfall = self._total + estimate - self.max_bytes
+                if shortfall <= 0:
+                    usage = self._usage(session_id)
+                    self._change(usage, lambda: setattr(usage, 'reserved', usage.reserved + estimate))
+                    return estimate
+                candidates = self._eviction_candidates(exclude=evicted | {session_id})
+
+            # Evict outside the lock: the callback deletes folders and calls back into release()
+            freed = 0
+            for candidate, size in candidates:
+                if freed >= shortfall or not self.evict:
+                    break
+                evicted.add(candidate)
+                if self.evict(candidate):
+                    freed += size
+                    self.evictions += 1
+                    print(f"💾 Evicted finished session {candidate} to free disk space")
+            if not freed:
+                return None
+
+    def reject(self):
+        """A download gave up waiting to be admitted"""
+        with self._lock:
+            self.rejections += 1
+            print(f"💾 No disk space for a download "
+                  f"({self._total / 1024 ** 2:.0f} of {self.max_bytes / 1024 ** 2:.0f} MB used)")
+
+    def subscribe(self, callback):
+        """Call callback() whenever space frees up"""
+        self._listeners.append(callback)
+
+    def _freed(self):
+        """Tell subscribers there may be room now (lock not held)"""
+        for listener in self._listeners:
+            listener()
+
+    def try_reserve(self, session_id, estimate):
+        """Reserve room only if it's free right now (no evicting, no waiting), for optional work"""
+        estimate = estimate or self.default_estimate
+        with self._lock:
+            if self._total + estimate > self.max_bytes:
+                return None
+            usage = self._usage(session_id)
+            self._change(usage, lambda: setattr(usage, 'reserved', usage.reserved + estimate))
+            return estimate
+
+    def _eviction_candidates(self, exclude):
+        """Finished, idle sessions in eviction order (lock held)"""
+        idle = [
+            (session_id, usage) for session_id, usage in self._sessions.items()
+            if session_id not in exclude and usage.completed_at and not usage.reserved
+        ]
+        idle.sort(key=lambda item: (not item[1].served, item[1].completed_at))
+        return [(session_id, usage.total()) for session_id, usage in idle]
+
+    def observe(self, session_id, path, nbytes):
+        """Record the size of a file that is still downloading"""
+        if not path or not nbytes:
+            return
+        with self._lock:
+            usage = self._sessions.get(session_id)
+            if usage is not None and usage.in_flight.get(path, 0) < nbytes:
+                self._change(usage, lambda: usage.in_flight.__setitem__(path, nbytes))
+
+    def settle(self, session_id, reserved, folder, filepath=None, filesize=0):
+        """A download ended: swap its reservation and partial files for the final file's size"""
+        folder = os.path.join(folder, '')
+        with self._lock:
+            usage = self._sessions.get(session_id)
+            if usage is None:
+                return
+
+            def update():
+                usage.reserved = max(0, usage.reserved - reserved)
+                for path in [path for path in usage.in_flight if path.startswith(folder)]:
+                    del usage.in_flight[path]
+                if filepath:
+                    usage.settled[filepath] = filesize
+                    usage.completed_at = time.time()
+                    usage.served = False
+
+            self._change(usage, update)
+        self._freed()
+
+    def discard(self, session_id, filepath):
+        """A settled file was moved or deleted"""
+        with self._lock:
+            usage = self._sessions.get(session_id)
+            if usage is None or filepath not in usage.settled:
+                return
+            self._change(usage, lambda: usage.settled.pop(filepath))
+        self._freed()
+
+    def mark_served(self, session_id):
+        """The session's file was sent to the client, so it's the first to go under pressure"""
+        with self._lock:
+            usage = self._sessions.get(session_id)
+            if usage is not None:
+                usage.served = True
+
+    def release(self, session_id):
+        """The session's folder is gone; forget everything it used"""
+        with self._lock:
+            usage = self._sessions.pop(session_id, None)
+            if usage is None:
+                return
+            self._total -= usage.total()
+        self._freed()
+
+    def stats(self):
+        """Totals for monitoring"""
+        with self._lock:
+            return {
+                'max_bytes': self.max_bytes,
+                'used_bytes': self._total,
+                'sessions': len(self._sessions),
+                'evictions': self.evictions,
+                'rejections': self.rejections,
+            }
@@ -1,11 +1,109 @@
 import os
 import re
-import yt_dlp
+import time
+import logging
+import copy
+import threading
+from concurrent.futures import Future
+from lazy_import import LazyModule, yt_dlp
 from datetime import datetime
+from urllib.parse import urlsplit, parse_qs
+from info_cache import TTLCache, canonicalize_url
+from media_store import MediaStore, link_or_copy
+from rate_limiter import PlatformGovernor
+from ydl_pool import YoutubeDLPool
+from transcode_pool import chain
+from single_flight import SingleFlight
+from metrics import FETCH_INFO_SECONDS, DOWNLOAD_BYTES, POSTPROCESS_SECONDS, MP4_FINALIZE, TRANSCODE_SECONDS_SAVED, COALESCED, ERRORS
 
-class UniversalDownloader:  
+# Imports yt-dlp's postprocessors, so it's loaded on first download too
+mp4_finalize = LazyModule('mp4_finalize')
+
+logger = logging.getLogger(__name__)
+
+
+class ProgressRecord:
+    """Per-session download progress, updated in place by the progress hook"""
+    
+    __slots__ = ('status', 'percentage', 'downloaded', 'total', 'speed', 'eta', 'message', 'published_at', 'counted')
+    
     def __init__(self):
-        self.progress_data = {}  # Store progress for each session
+        self.reset()
+    
+    def reset(self):
+        """Back to the 'starting' state"""
+        self.status = 'starting'
+        self.percentage = 0
+        self.downloaded = 0
+        self.total = None
+        self.speed = None
+        self.eta = 0
+        self.message = 'Initializing download...'
+        self.published_at = 0.0
+        self.counted = {}  # filename -> bytes already added to the throughput counter
+    
+    def to_dict(self):
+        """JSON view (same shape the progress endpoints always returned)"""
+        if self.status != 'downloading':
+            return {'status': self.status, 'percentage': self.percentage, 'message': self.message}
+        
+        if self.speed:
+            speed_str = f"{self.speed / (1024 * 1024):.2f} MB/s"  # Convert to MB/s
+        else:
+            speed_str = "calculating..."
+        
+        return {
+            'status': 'downloading',
+            'percentage': self.percentage,
+            'downloaded': self.downloaded,
+            'total': self.total,
+            'speed': speed_str,
+            'eta': self.eta
+        }
+
+
+class UniversalDownloader:  
+    # Treat signed media URLs as expired this many seconds before they really do
+    URL_EXPIRY_MARGIN = 60
+    
+    # Retries after an HTTP 429 (the governor backs off before each one)
+    RATE_LIMIT_RETRIES = 2
+    
+    # Postprocessing applied by download_with_quality (part of the media store key)
+    POSTPROCESS_PROFILE = 'merge:mp4|convert:mp4'
+    
+    # ffmpeg seconds per second of media for a transcode, until real ones have been timed
+    TRANSCODE_SECONDS_PER_MEDIA_SECOND = 0.5
+    
+    def __init__(self, info_cache_ttl=600, info_cache_size=1024, info_reuse_ttl=300, info_reuse_size=128,
+                 media_store=None, progress_updates_per_second=4, governor=None,
+                 ydl_pool=None, disk_budget=None, transcode_pool=None):
+        self.progress_data = {}  # session_id -> ProgressRecord
+        self.progress_interval = 1.0 / progress_updates_per_second  # Min seconds between published updates
+        self.progress_versions = {}  # Bumped on every progress change, for streaming listeners (gone once cleared)
+        self._progress_conditions = {}  # session_id -> [Condition, listeners], only while someone is waiting
+        self._progress_lock = threading.Lock()
+        # Recent fetch_video_info results, keyed by canonical URL
+        self.info_cache = TTLCache(ttl=info_cache_ttl, maxsize=info_cache_size)
+        # Raw yt-dlp info_dicts from fetch-info, keyed by canonical URL (stored as-is, copied when taken)
+        self.extraction_cache = TTLCache(ttl=info_reuse_ttl, maxsize=info_reuse_size, copy_values=False)
+        # Optional shared store of finished files (see MediaStore)
+        self.media_store = media_store
+        # Per-platform rate limit for requests to the platforms themselves
+        self.governor = governor or PlatformGovernor()
+        # Warm YoutubeDL instances, reused across requests with the same options
+        self.ydl_pool = ydl_pool or YoutubeDLPool()
+        # Optional DiskBudget that tracks bytes written per session
+        self.disk_budget = disk_budget
+        # Optional TranscodePool that takes ffmpeg conversions off the download thread
+        self.transcode_pool = transcode_pool
+        # Identical concurrent extractions and downloads run once and share the outcome
+        self.info_flights = SingleFlight()
+        self.download_flights = SingleFlight()
+        # Start times of running postprocessors, per download thread
+        self._postprocess_started = threading.local()
+        # Moving average of measured transcode cost, for estimating the time remuxing saves
+        self.transcode_rate = self.TRANSCODE_SECONDS_PER_MEDIA_SECOND
     
     def detect_platform(self, url):
         """Detect the platform from URL"""
@@ -46,11 +144,18 @@ class UniversalDownloader:
             'Cache-Control': 'max-age=0',
         }
     
-    def fetch_video_info(self, url):
+    def fetch_video_info(self, url, session_id=None):
         """Fetch video metadata WITHOUT downloading"""
         try:  
             platform = self.detect_platform(url)
             
+            # Serve repeat lookups from the cache
+            cache_key = canonicalize_url(url)
+            cached = self.info_cache.get(cache_key)
+            if cached:
+                print(f"⚡ Info cache hit: {cache_key}")
+                return cached
+            
             print(f"\n{'='*60}")
             print(f"🔍 Fetching video info")
             print(f"Platform: {platform}")
@@ -107,86 +212,95 @@ class UniversalDownloader:
             else:
                 print("❓ Unknown platform - attempting generic extraction")
             
-            # Try to extract info
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=False)
-                
-                if not info:
-                    return {'status': 'error', 'message': 'Unable to fetch video information'}
-                
-                # Extract thumbnail
-                thumbnail = info.get('thumbnail', '') or info.get('thumbnails', [{}])[0].get('url', '')
-                
-                # Extract title
-                title = info.get('title', 'Unknown Title')
-                
-                # Extract duration
-                duration_seconds = info.get('duration', 0)
-                duration = self.format_duration(duration_seconds)
-                
-                # Extract uploader
-                uploader = info.get('uploader', info.get('channel', info.get('creator', 'Unknown')))
-                
-                # Extract formats (for quality selection)
-                formats = []
-                has_quality = self.has_quality_options(platform)
+            # Identical lookups already running (a link going viral) share that one extraction
+            info, shared = self.info_flights.run(cache_key, lambda: self._extract_info(url, platform, ydl_opts))
+            if shared:
+                print(f"🤝 Joined in-flight extraction: {cache_key}")
+                COALESCED.inc('fetch_info')
+                info = info.result()
+            
+            if not info:
+                return {'status': 'error', 'message': 'Unable to fetch video information'}
+            
+            # Keep the extraction so downloads of this URL (any session) can skip it
+            self.extraction_cache.set(cache_key, info)
+            
+            # Extract thumbnail
+            thumbnail = info.get('thumbnail', '') or info.get('thumbnails', [{}])[0].get('url', '')
+            
+            # Extract title
+            title = info.get('title', 'Unknown Title')
+            
+            # Extract duration
+            duration_seconds = info.get('duration', 0)
+            duration = self.format_duration(duration_seconds)
+            
+            # Extract uploader
+            uploader = info.get('uploader', info.get('channel', info.get('creator', 'Unknown')))
+            
+            # Extract formats (for quality selection)
+            formats = []
+            has_quality = self.has_quality_options(platform)
+            
+            if has_quality and 'formats' in info:
+                # Filter video formats (must have both video and audio)
+                video_formats = []
                 
-                if has_quality and 'formats' in info:
-                    # Filter video formats (must have both video and audio)
-                    video_formats = []
-                    
-                    for f in info['formats']:
-                        vcodec = f.get('vcodec', 'none')
-                        acodec = f.get('acodec', 'none')
-                        height = f.get('height')
-                        
-                        # Include formats with video and audio OR video-only (we'll merge later)
-                        if vcodec != 'none' and height:
-                            video_formats. append(f)
-                    
-                    # Get unique resolutions
-                    seen_heights = set()
-                    for fmt in video_formats:
-                        height = fmt.get('height')
-                        if height and height not in seen_heights and height >= 240:
-                            seen_heights.add(height)
-                            filesize = fmt.get('filesize') or fmt.get('filesize_approx', 0)
-                            formats. append({
-                                'format_id': fmt['format_id'],
-                                'quality': f"{height}p",
-                                'height': height,
-                                'ext': fmt.get('ext', 'mp4'),
-                                'filesize': filesize,
-                                'filesize_human': self.format_filesize(filesize)
-                            })
+                for f in info['formats']:
+                    vcodec = f.get('vcodec', 'none')
+                    acodec = f.get('acodec', 'none')
+                    height = f.get('height')
                     
-                    # Sort by quality (highest first)
-                    formats. sort(key=lambda x: x['height'], reverse=True)
-                
-                # Build result
-                result = {
-                    'status': 'success',
-                    'platform': platform,
-                    'title': title,
-                    'thumbnail': thumbnail,
-                    'duration': duration,
-                    'has_quality_options': has_quality,
-                    'formats': formats,
-                    'uploader': uploader,
-                    'view_count': info.get('view_count', 0)
-                }
+                    # Include formats with video and audio OR video-only (we'll merge later)
+                    if vcodec != 'none' and height:
+                        video_formats. append(f)
                 
-                print(f"✅ Info fetched successfully")
-                print(f"Title: {title}")
-                print(f"Duration: {duration}")
-                print(f"Uploader: {uploader}")
-                print(f"Available formats: {len(formats)}")
-                
-                return result
+                # Get unique resolutions
+                seen_heights = set()
+                for fmt in video_formats:
+                    height = fmt.get('height')
+                    if height and height not in seen_heights and height >= 240:
+                        seen_heights.add(height)
+                        filesize = fmt.get('filesize') or fmt.get('filesize_approx', 0)
+                        formats. append({
+                            'format_id': fmt['format_id'],
+                            'quality': f"{height}p",
+                            'height': height,
+                            'ext': fmt.get('ext', 'mp4'),
+                            'filesize': filesize,
+                            'filesize_human': self.format_filesize(filesize)
+                        })
                 
+                # Sort by quality (highest first)
+                formats. sort(key=lambda x: x['height'], reverse=True)
+            
+            # Build result
+            result = {
+                'status': 'success',
+                'platform': platform,
+                'title': title,
+                'thumbnail': thumbnail,
+                'duration': duration,
+                'has_quality_options': has_quality,
+                'formats': formats,
+                'uploader': uploader,
+                'view_count': info.get('view_count', 0)
+            }
+            
+            print(f"✅ Info fetched successfully")
+            print(f"Title: {title}")
+            print(f"Duration: {duration}")
+            print(f"Uploader: {uploader}")
+            print(f"Available formats: {len(formats)}")
+            
+            self.info_cache.set(cache_key, result)
+            
+            return result
+            
         except yt_dlp.utils. DownloadError as e:
             error_msg = str(e)
             print(f"❌ yt-dlp DownloadError: {error_msg}")
+            ERRORS.inc('fetch_info', self.error_category(error_msg))
             
             # Detailed error handling
             if 'Video unavailable' in error_msg or 'This video is unavailable' in error_msg: 
@@ -235,6 +349,7 @@ class UniversalDownloader:
         except Exception as e: 
             error_str = str(e)
             print(f"❌ Unexpected error: {error_str}")
+            ERRORS.inc('fetch_info', 'internal')
             
             if 'HTTP Error' in error_str:
                 return {'status': 'error', 'message': 'Network error. Please try again'}
@@ -243,6 +358,108 @@ class UniversalDownloader:
             else:
                 return {'status': 'error', 'message': 'Your link is broken, please provide valid link'}
     
+    def _extract_info(self, url, platform, ydl_opts):
+        """Run one extraction, returns the sanitized info_dict (safe to share between requests)"""
+        with self.ydl_pool.get(ydl_opts) as ydl:
+            started = time.perf_counter()
+            info = self.call_governed(platform, lambda: ydl.extract_info(url, download=False))
+            FETCH_INFO_SECONDS.observe(time.perf_counter() - started, platform)
+            return ydl.sanitize_info(info, remove_private_keys=True) if info else None
+    
+    @staticmethod
+    def error_category(error_msg):
+        """Coarse category of a yt-dlp error, for metrics"""
+        lowered = error_msg.lower()
+        if '429' in error_msg or 'too many requests' in lowered or 'rate' in lowered:
+            return 'rate_limited'
+        if 'private' in lowered or 'login' in lowered or 'sign in' in lowered:
+            return 'login_required'
+        if '403' in error_msg:
+            return 'forbidden'
+        if '404' in error_msg or 'unavailable' in lowered:
+            return 'unavailable'
+        if 'geo' in lowered or 'not available' in lowered:
+            return 'geo_restricted'
+        if 'unsupported url' in lowered or 'no video formats' in lowered:
+            return 'unsupported'
+        if 'ffmpeg' in lowered or 'postprocessing' in lowered:
+            return 'postprocessing'
+        if 'timed out' in lowered or 'connection' in lowered or 'http error' in lowered:
+            return 'network'
+        return 'other'
+    
+    @staticmethod
+    def is_rate_limited(error):
+        """Check if a yt-dlp error means the platform is rate limiting us"""
+        error_msg = str(error)
+        return 'HTTP Error 429' in error_msg or 'Too Many Requests' in error_msg or 'rate-limit' in error_msg.lower()
+    
+    def call_governed(self, platform, request, abandon=None):
+        """Run an upstream request under the platform's rate limit, backing off and retrying on 429s.
+        
+        Speculative requests (with abandon, see download_content) only use spare capacity and give
+        up (DownloadCancelled) instead of waiting.
+        """
+        for attempt in range(self.RATE_LIMIT_RETRIES + 1):
+            if abandon is None or not self.governor.try_acquire_spare(platform):
+                if abandon is not None and abandon():
+                    raise yt_dlp.utils.DownloadCancelled('No spare request capacity for a speculative download')
+                if not self.governor.acquire(platform):
+                    # Queue is already longer than we're willing to wait
+                    raise yt_dlp.utils.DownloadError('HTTP Error 429: Too Many Requests (local request queue is full)')
+            
+            try:
+                result = request()
+            except yt_dlp.utils.DownloadError as e:
+                if not self.is_rate_limited(e):
+                    raise
+                self.governor.report_rate_limited(platform)
+                if attempt == self.RATE_LIMIT_RETRIES:
+                    raise
+                print(f"🔁 Retrying after rate limit (attempt {attempt + 2})")
+                continue
+            
+            self.governor.report_success(platform)
+            return result
+    
+    def get_cached_extraction(self, url):
+        """Copy of the info_dict fetch-info stored for this URL, if its media URLs are still valid"""
+        info = self.extraction_cache.get(canonicalize_url(url))
+        
+        if not info:
+            return None
+        
+        # Sanitizing drops a playlist's entries (multi-video tweets, carousels, galleries)
+        if info.get('_type') == 'playlist':
+            return None
+        
+        if self.media_urls_expired(info):
+            print("⌛ Cached extraction has expired media URLs - extracting again")
+            return None
+        
+        # yt-dlp fills in the info_dict while downloading, and other downloads may take the same one
+        return copy.deepcopy(info)
+    
+    def media_urls_expired(self, info):
+        """Check the signed 'expire' timestamps on the info_dict's media URLs"""
+        deadline = time.time() + self.URL_EXPIRY_MARGIN
+        
+        for fmt in info.get('formats') or [info]:
+            media_url = fmt.get('url') or fmt.get('manifest_url')
+            if not media_url:
+                continue
+            
+            # Query form (?expire=...) or path form (/expire/<ts>/) as used by YouTube
+            expire = parse_qs(urlsplit(media_url).query).get('expire', [None])[0]
+            if not expire:
+                match = re.search(r'/expire/(\d+)', media_url)
+                expire = match.group(1) if match else None
+            
+            if expire and expire.isdigit() and int(expire) < deadline:
+                return True
+        
+        return False
+    
     def format_duration(self, seconds):
         """Convert seconds to MM:SS or HH:MM:SS"""
         if not seconds or seconds <= 0:
@@ -268,59 +485,159 @@ class UniversalDownloader:
             bytes /= 1024
         return f"{bytes:.1f} TB"
     
+    @staticmethod
+    def check_cancelled(cancel):
+        """Progress hook that aborts the download once its cancel Event is set"""
+        if cancel.is_set():
+            raise yt_dlp.utils.DownloadCancelled()
+    
     def progress_hook(self, d, session_id):
-        """Progress hook for yt-dlp"""
-        if d['status'] == 'downloading':  
+        """Progress hook for yt-dlp (runs on every downloaded chunk, so keep it cheap)"""
+        record = self.progress_data.get(session_id)
+        if record is None:
+            record = self.progress_data[session_id] = ProgressRecord()
+        
+        status = d['status']
+        
+        if status == 'downloading':  
             # Calculate percentage
-            if 'total_bytes' in d:  
-                total = d['total_bytes']
-            elif 'total_bytes_estimate' in d:
-                total = d['total_bytes_estimate']
-            else:
-                total = None
+            total = d.get('total_bytes') or d.get('total_bytes_estimate')
+            downloaded = d.get('downloaded_bytes') or 0
             
-            if total:  
-                downloaded = d. get('downloaded_bytes', 0)
-                percentage = int((downloaded / total) * 100)
-            else:
-                percentage = 0
+            record.status = 'downloading'
+            record.downloaded = downloaded
+            record.total = total
+            record.percentage = int(downloaded * 100 / total) if total else 0
+            record.speed = d.get('speed')
+            record.eta = d.get('eta') or 0
             
-            # Get speed
-            speed = d.get('speed', 0)
-            if speed:   
-                speed_mb = speed / (1024 * 1024)  # Convert to MB/s
-                speed_str = f"{speed_mb:.2f} MB/s"
-            else:
-                speed_str = "calculating..."
-            
-            # Store progress
-            self.progress_data[session_id] = {
-                'status': 'downloading',
-                'percentage': percentage,
-                'downloaded': d.get('downloaded_bytes', 0),
-                'total': total,
-                'speed': speed_str,
-                'eta': d.get('eta', 0)
-            }
+            # Only publish a few times per second, the record itself is always current
+            now = time.monotonic()
+            if now - record.published_at < self.progress_interval:
+                return
+            record.published_at = now
+            
+            self.notify_progress(session_id)
+            self._count_bytes(record, d.get('filename'), downloaded)
+            if self.disk_budget:
+                self.disk_budget.observe(session_id, d.get('filename'), total or downloaded)
             
-            print(f"📊 Progress: {percentage}% | Speed: {speed_str}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("📊 Progress: %s%% | %s", record.percentage, record.to_dict()['speed'])
         
-        elif d['status'] == 'finished':
-            self.progress_data[session_id] = {
-                'status':  'finished',
-                'percentage': 100,
-                'message': 'Processing.. .'
-            }
-            print(f"✅ Download finished, processing...")
+        elif status == 'finished':
+            record.status = 'finished'
+            record.percentage = 100
+            record.message = 'Processing...'
+            
+            self.notify_progress(session_id)
+            self._count_bytes(record, d.get('filename'), d.get('downloaded_bytes') or d.get('total_bytes') or 0)
+            if self.disk_budget:
+                self.disk_budget.observe(session_id, d.get('filename'), d.get('total_bytes') or d.get('downloaded_bytes'))
+            logger.info("✅ Download finished, processing...")
+    
+    @staticmethod
+    def _count_bytes(record, filename, downloaded):
+        """Add a file's new bytes since the last published update to the throughput counter"""
+        counted = record.counted.get(filename, 0)
+        if downloaded > counted:
+            DOWNLOAD_BYTES.inc(amount=downloaded - counted)
+            record.counted[filename] = downloaded
+    
+    def postprocessor_hook(self, d):
+        """Time each ffmpeg postprocessing step (merge, convert)"""
+        started = self._postprocess_started.__dict__
+        name = d.get('postprocessor')
+        if d['status'] == 'started':
+            started[name] = time.perf_counter()
+        elif d['status'] == 'finished' and name in started:
+            POSTPROCESS_SECONDS.observe(time.perf_counter() - started.pop(name), name)
+    
+    def record_finalize(self, action, seconds, info):
+        """Count how a download was made into MP4 and estimate the transcode time that saved"""
+        MP4_FINALIZE.inc(action)
+        duration = info.get('duration')
+        if not duration:
+            return
+        
+        if action == 'transcode':
+            self.transcode_rate = 0.8 * self.transcode_rate + 0.2 * (seconds / duration)
+        
+        # MP4 files were never converted, only remuxes save anything
+        elif action == 'remux':
+            saved = max(0.0, duration * self.transcode_rate - seconds)
+            TRANSCODE_SECONDS_SAVED.inc(amount=saved)
+            print(f"⚡ Remuxed instead of transcoding in {seconds:.1f}s (~{saved:.0f}s saved)")
+    
+    def _listen(self, session_id):
+        """Register a progress listener, returns the Condition to wait on"""
+        with self._progress_lock:
+            entry = self._progress_conditions.get(session_id)
+            if entry is None:
+                entry = self._progress_conditions[session_id] = [threading.Condition(), 0]
+            entry[1] += 1
+            return entry[0]
+    
+    def _unlisten(self, session_id):
+        """Drop a listener, and the session's Condition with the last one"""
+        with self._progress_lock:
+            entry = self._progress_conditions[session_id]
+            entry[1] -= 1
+            if not entry[1]:
+                del self._progress_conditions[session_id]
+    
+    def _wake_listeners(self, session_id):
+        with self._progress_lock:
+            entry = self._progress_conditions.get(session_id)
+        if entry:
+            with entry[0]:
+                entry[0].notify_all()
+    
+    def start_progress(self, session_id):
+        """Reset a session's progress record for a new download"""
+        record = self.progress_data.get(session_id)
+        if record is None:
+            self.progress_data[session_id] = ProgressRecord()
+        else:
+            record.reset()
+        self.notify_progress(session_id)
+    
+    def notify_progress(self, session_id):
+        """Wake up streaming listeners for a session (a new version only while it has progress)"""
+        with self._progress_lock:
+            if session_id in self.progress_data:
+                self.progress_versions[session_id] = self.progress_versions.get(session_id, 0) + 1
+        self._wake_listeners(session_id)
+    
+    def wait_for_progress(self, session_id, last_version, timeout=None, done=None):
+        """Block until the session's progress changes after last_version (or done() is true).
+        
+        Returns (version, progress); version is unchanged if the timeout ran out, None once cleared.
+        """
+        condition = self._listen(session_id)
+        try:
+            with condition:
+                condition.wait_for(
+                    lambda: self.progress_versions.get(session_id) != last_version or (done is not None and done()),
+                    timeout
+                )
+                return self.progress_versions.get(session_id), self.get_progress(session_id)
+        finally:
+            self._unlisten(session_id)
     
     def get_progress(self, session_id):
         """Get current progress for a session"""
-        return self.progress_data.get(session_id, {'status': 'unknown', 'percentage': 0})
+        record = self.progress_data.get(session_id)
+        if record is None:
+            return {'status': 'unknown', 'percentage': 0}
+        return record.to_dict()
     
     def clear_progress(self, session_id):
-        """Clear progress data for a session"""
-        if session_id in self.progress_data:
-            del self.progress_data[session_id]
+        """Clear progress data for a session (listeners see its version disappear)"""
+        with self._progress_lock:
+            self.progress_data.pop(session_id, None)
+            self.progress_versions.pop(session_id, None)
+        self._wake_listeners(session_id)
     
     def cleanup_invalid_files(self, folder):
         """Remove . mhtml and other invalid files"""
@@ -364,8 +681,9 @@ class UniversalDownloader:
         
         return None
     
-    def download_with_quality(self, url, path, session_id=None, format_id=None, platform=None):
-        """Download video with specific quality"""
+    def download_with_quality(self, url, path, session_id=None, format_id=None, platform=None, cancel=None,
+                              abandon=None):
+        """Download video with specific quality (setting the optional cancel Event stops it)"""
         try:
             # Base download options
             ydl_opts = {
@@ -375,10 +693,8 @@ class UniversalDownloader:
                 'no_check_certificate': True,
                 'http_headers': self.get_common_headers(),
                 'merge_output_format': 'mp4',
-                'postprocessors': [{
-                    'key':  'FFmpegVideoConvertor',
-                    'preferedformat': 'mp4',
-                }],
+                'noprogress': True,  # Progress is reported through progress_hook instead
+                'postprocessor_hooks': [self.postprocessor_hook],
             }
             
             # Platform-specific configurations
@@ -422,11 +738,32 @@ class UniversalDownloader:
             # Add progress hook
             if session_id:  
                 ydl_opts['progress_hooks'] = [lambda d:  self.progress_hook(d, session_id)]
+            if cancel is not None:
+                ydl_opts['progress_hooks'] = [lambda d: self.check_cancelled(cancel)] + ydl_opts.get('progress_hooks', [])
             
             print(f"📥 Starting download:  {url}")
             
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=True)
+            # Reuse the extraction from fetch-info when we still have it
+            cached_info = self.get_cached_extraction(url)
+            
+            with self.ydl_pool.get(ydl_opts) as ydl:
+                # Skip, remux or transcode depending on what was downloaded (the pool drops it on release)
+                finalizer = mp4_finalize.Mp4FinalizePP(
+                    report=self.record_finalize, defer_transcode=self.transcode_pool is not None)
+                ydl.add_post_processor(finalizer, when='post_process')
+                
+                if cached_info:
+                    try:
+                        print("♻️ Reusing fetch-info extraction")
+                        info = ydl.process_ie_result(cached_info, download=True)
+                    except yt_dlp.utils.DownloadCancelled:
+                        raise
+                    except yt_dlp.utils.YoutubeDLError as e:
+                        # Signed media URLs rejected, or the cached info didn't work out - extract afresh
+                        print(f"⌛ Reusing the extraction failed, extracting again: {e}")
+                        info = self.call_governed(platform, lambda: ydl.extract_info(url, download=True), abandon)
+                else:
+                    info = self.call_governed(platform, lambda: ydl.extract_info(url, download=True), abandon)
                 
                 if not info:
                     return {'status':  'error', 'message':  'Download failed - no info returned'}
@@ -453,7 +790,7 @@ class UniversalDownloader:
                 print(f"✅ Downloaded successfully: {os.path.basename(actual_file)}")
                 print(f"📦 File size: {self.format_filesize(filesize)}")
                 
-                return {
+                result = {
                     'status': 'success',
                     'message': 'Video downloaded successfully! ',
                     'title': info.get('title', 'Unknown'),
@@ -463,9 +800,18 @@ class UniversalDownloader:
                     'type': 'video'
                 }
                 
+                if finalizer.deferred:
+                    return self.hand_off_transcode(finalizer, info, result, abandon)
+                return result
+        
+        except yt_dlp.utils.DownloadCancelled:
+            print(f"🛑 Download cancelled: {url}")
+            return {'status': 'cancelled', 'message': 'Download cancelled'}
+                
         except yt_dlp.utils. DownloadError as e:
             error_msg = str(e)
             print(f"❌ Download error: {error_msg}")
+            ERRORS.inc('download', self.error_category(error_msg))
             
             if 'HTTP Error 429' in error_msg or 'rate' in error_msg.lower():
                 return {'status': 'error', 'message': 'Rate limited.  Please wait a few minutes'}
@@ -481,19 +827,124 @@ class UniversalDownloader:
         except Exception as e:
             error_str = str(e)
             print(f"❌ Unexpected download error: {error_str}")
+            ERRORS.inc('download', 'internal')
             return {'status': 'error', 'message': f'Download error: {error_str[: 100]}'}
     
-    def download_content(self, url, download_path, session_id=None, format_id=None):
-        """Main download function"""
+    def hand_off_transcode(self, finalizer, info, result, abandon=None):
+        """Queue the MP4 conversion on the transcode pool.
+        
+        Returns a Future of the final result dict, or an error result if the pool is full.
+        A speculative download (with abandon) only gets the pool while it's idle, and is cancelled otherwise.
+        """
+        source = result['filepath']
+        target = os.path.splitext(source)[0] + '.mp4'
+        temp = os.path.splitext(source)[0] + '.temp.mp4'
+        
+        pool_busy = self.transcode_pool.active_count() or self.transcode_pool.queued_count()
+        if abandon is not None and pool_busy and abandon():
+            os.remove(source)
+            print(f"🛑 Transcode pool busy, dropping speculative download: {result['filename']}")
+            return {'status': 'cancelled', 'message': 'Download cancelled'}
+        
+        future = self.transcode_pool.submit(finalizer.transcode_command(source, temp, self.transcode_pool.threads_per_job))
+        if future is None:
+            ERRORS.inc('download', 'transcode_busy')
+            os.remove(source)
+            return {'status': 'error', 'message': 'Server is busy converting videos. Please try again in a moment'}
+        
+        print(f"🎞️ Handed off transcode: {result['filename']}")
+        
+        def finish(transcode):
+            try:
+                seconds = transcode.result()
+                os.replace(temp, target)
+            except Exception as e:
+                print(f"❌ Transcode failed: {e}")
+                ERRORS.inc('download', 'postprocessing')
+                for path in (source, temp):
+                    if os.path.exists(path):
+                        os.remove(path)
+                return {'status': 'error', 'message': f'Conversion failed: {str(e)[:100]}'}
+            
+            os.remove(source)
+            POSTPROCESS_SECONDS.observe(seconds, 'TranscodePool')
+            self.record_finalize('transcode', seconds, info)
+            print(f"✅ Transcoded in {seconds:.1f}s: {os.path.basename(target)}")
+            return dict(result, filename=os.path.basename(target), filepath=target, filesize=os.path.getsize(target))
+        
+        return chain(future, finish)
+    
+    def estimate_download_size(self, url, format_id=None):
+        """Expected size of a download from the cached fetch-info result, or None if unknown"""
+        info = self.info_cache.get(canonicalize_url(url))
+        if not info or not info.get('formats'):
+            return None
+        
+        if format_id:
+            fmt = next((f for f in info['formats'] if f['format_id'] == format_id), None)
+        else:
+            # Same choice as the default 'best[height<=1080]' selector
+            fmt = next((f for f in info['formats'] if f['height'] <= 1080), None)
+        
+        if not fmt or not fmt['filesize']:
+            return None
+        # Leave room for the audio track merged into video-only formats
+        return int(fmt['filesize'] * 1.15)
+    
+    def get_store_key(self, url, format_id, platform):
+        """Media store key for a download request"""
+        # These platforms always download 'best', whatever format was asked for
+        if platform in ['instagram', 'facebook', 'tiktok']:
+            format_id = None
+        return MediaStore.make_key(canonicalize_url(url), format_id, self.POSTPROCESS_PROFILE)
+    
+    def download_from_store(self, store_key, download_path):
+        """Link an already downloaded file into download_path, if the store has it"""
+        filepath = self.media_store.fetch(store_key, download_path)
+        
+        if not filepath:
+            return None
+        
+        filename = os.path.basename(filepath)
+        filesize = os.path.getsize(filepath)
+        
+        print(f"📦 Served from media store: {filename} ({self.format_filesize(filesize)})")
+        
+        return {
+            'status': 'success',
+            'message': 'Video downloaded successfully! ',
+            'title': os.path.splitext(filename)[0],
+            'filename': filename,
+            'filepath': filepath,
+            'filesize': filesize,
+            'type': 'video'
+        }
+    
+    def download_content(self, url, download_path, session_id=None, format_id=None, hand_off=False, cancel=None,
+                         abandon=None):
+        """Main download function.
+        
+        With hand_off=True a download that still needs transcoding returns a Future of the result
+        as soon as the network phase is done, instead of waiting for the transcode pool.
+        
+        Speculative downloads pass a cancel Event: setting it stops the download, and since it
+        may be abandoned it joins an identical download already running but never leads one.
+        Where it would have to wait for rate-limit tokens or the transcode pool it calls abandon()
+        instead, and gives up if that returns True (it doesn't once the download was confirmed).
+        """
         platform = self.detect_platform(url)
         
+        # Popular videos are usually already in the shared store
+        store_key = None
+        if self.media_store:
+            store_key = self.get_store_key(url, format_id, platform)
+            stored = self.download_from_store(store_key, download_path)
+            if stored:
+                return stored
+        
         # Initialize progress
         if session_id:
-            self. progress_data[session_id] = {
-                'status': 'starting',
-                'percentage': 0,
-                'message': 'Initializing download...'
-            }
+            self.start_progress(session_id)
         
         print(f"\n{'='*60}")
         print(f"🚀 Starting download")
@@ -505,16 +956,25 @@ class UniversalDownloader:
         print(f"{'='*60}\n")
         
         try:
-            result = self.download_with_quality(url, download_path, session_id, format_id, platform)
+            # Identical downloads already running share that one; this request gets its own copy of the file
+            result, shared = self.download_flights.run(
+                self.get_store_key(url, format_id, platform),
+                lambda: self._download_and_finish(
+                    url, download_path, session_id, format_id, platform, store_key, cancel, abandon),
+                lead=cancel is None
+            )
+            if shared:
+                print(f"🤝 Joined in-flight download: {url} (Format: {format_id})")
+                COALESCED.inc('download')
+                record = self.progress_data.get(session_id)
+                if record:
+                    record.message = 'Same video is already downloading, waiting for it...'
+                    self.notify_progress(session_id)
+                result = chain(result, lambda leader: self._share_download(leader.result(), store_key, download_path, session_id))
             
-            print(f"\n{'='*60}")
-            print(f"Result: {result['status']}")
-            print(f"Message: {result. get('message', 'N/A')}")
-            print(f"{'='*60}\n")
-            
-            # Clear progress data after completion
-            if session_id:  
-                self.clear_progress(session_id)
+            if isinstance(result, Future):
+                result = chain(result, lambda done: self._result_or_error(done, session_id))
+                return result if hand_off else result.result()
             
             return result
             
@@ -522,4 +982,65 @@ class UniversalDownloader:
             print(f"❌ Unexpected error: {str(e)}")
             if session_id:
                 self. clear_progress(session_id)
-            return {'status': 'error', 'message': f'Unexpected error: {str(e)}'}
\ No newline at end of file
+            return {'status': 'error', 'message': f'Unexpected error: {str(e)}'}
+    
+    def _download_and_finish(self, url, download_path, session_id, format_id, platform, store_key, cancel=None,
+                             abandon=None):
+        """Download, then store and report the result (a Future of it if a transcode was handed off)"""
+        result = self.download_with_quality(url, download_path, session_id, format_id, platform, cancel, abandon)
+        
+        if isinstance(result, Future):
+            return chain(result, lambda transcode: self._finish_download(transcode.result(), store_key, session_id))
+        
+        return self._finish_download(result, store_key, session_id)
+    
+    def _share_download(self, leader_result, store_key, download_path, session_id):
+        """Give a request that joined another one's download its own link to the finished file"""
+        try:
+            if leader_result['status'] != 'success':
+                return dict(leader_result)
+            
+            if store_key:
+                stored = self.download_from_store(store_key, download_path)
+                if stored:
+                    return stored
+            
+            filepath = os.path.join(download_path, leader_result['filename'])
+            link_or_copy(leader_result['filepath'], filepath)
+            print(f"🤝 Shared download: {leader_result['filename']}")
+            return dict(leader_result, filepath=filepath, filesize=os.path.getsize(filepath))
+        
+        except OSError as e:
+            print(f"❌ Could not share download: {e}")
+            return {'status': 'error', 'message': 'Download failed, please try again'}
+        
+        finally:
+            if session_id:
+                self.clear_progress(session_id)
+    
+    def _result_or_error(self, done, session_id):
+        """Result of a finished download Future, with errors turned into an error result"""
+        try:
+            return done.result()
+        except Exception as e:
+            print(f"❌ Unexpected error: {str(e)}")
+            if session_id:
+                self.clear_progress(session_id)
+            return {'status': 'error', 'message': f'Unexpected error: {str(e)}'}
+    
+    def _finish_download(self, result, store_key, session_id):
+        """Store, report and clear progress once the file is final"""
+        # Share the finished file with later requests for the same content
+        if store_key and result['status'] == 'success':
+            self.media_store.put(store_key, result['filepath'])
+        
+        print(f"\n{'='*60}")
+        print(f"Result: {result['status']}")
+        print(f"Message: {result. get('message', 'N/A')}")
+        print(f"{'='*60}\n")
+        
+        # Clear progress data after completion
+        if session_id:  
+            self.clear_progress(session_id)
+        
+        return result
@@ -0,0 +1,131 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+# Query parameters that only track where a link was shared from, on any site
+TRACKING_PARAMS = {'igshid', 'igsh', 'fbclid', 'gclid', 'mibextid'}
+
+# Names that are tracking on these platforms but may pick the content elsewhere (e.g. ?s=101)
+PLATFORM_TRACKING_PARAMS = {
+    'youtube.com': {'si', 'feature'},
+    'twitter.com': {'s', 't', 'ref_src', 'ref_url'},
+    'instagram.com': {'ref'},
+    'tiktok.com': {'is_from_webapp', 'sender_device', 'share_id', 'ref'},
+    'reddit.com': {'share_id', 'ref', 'ref_source'},
+    'facebook.com': {'ref', 'sfnsn'},
+}
+
+
+def _tracking_params(host):
+    """Parameter names to drop for a host (subdomains share their platform's set)"""
+    for domain, params in PLATFORM_TRACKING_PARAMS.items():
+        if host == domain or host.endswith('.' + domain):
+            return TRACKING_PARAMS | params
+    return TRACKING_PARAMS
+
+
+def canonicalize_url(url):
+    """Normalize a URL so share links for the same video map to one key"""
+    parts = urlsplit(url.strip())
+
+    host = (parts.hostname or '').lower()
+    for prefix in ('www.', 'm.', 'mobile.'):
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+            break
+
+    path = parts.path.rstrip('/') or '/'
+    query = parse_qsl(parts.query, keep_blank_values=False)
+
+    # YouTube: every share form ends up as watch?v=<id>
+    if host == 'youtu.be' and path != '/':
+        return f"https://youtube.com/watch?v={path.lstrip('/')}"
+    if host == 'youtube.com':
+        if path.startswith('/shorts/'):
+            return f"https://youtube.com/watch?v={path.split('/')[2]}"
+        video_id = dict(query).get('v')
+        if path == '/watch' and video_id:
+            return f"https://youtube.com/watch?v={video_id}"
+
+    if host == 'x.com':
+        host = 'twitter.com'
+
+    tracking = _tracking_params(host)
+    query = sorted(
+        (key, value) for key, value in query
+        if key.lower() not in tracking and not key.lower().startswith('utm_')
+    )
+
+    return urlunsplit(('https', host, path, urlencode(query), ''))
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after a fixed TTL"""
+
+    def __init__(self, ttl=600, maxsize=1024, copy_values=True):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        # Without copies, callers must treat cached values as read-only
+        self.copy_values = copy_values
+        self.hits = 0
+        self.misses = 0
+
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Get a copy of a cached value, or None if missing/expired"""
+        with self._lock:
+            entry = self._data.get(key)
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return None
+
+            self._data.move_to_end(key)
+            self.hits += 1
+
+        # Callers get their own copy so they can't modify the cached entry
+        return copy.deepcopy(value) if self.copy_values else value
+
+    def set(self, key, value):
+        """Store (a copy of) value, evicting the least recently used entry if full"""
+        if self.copy_values:
+            value = copy.deepcopy(value)
+
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        """Remove an entry"""
+        with self._lock:
+            entry = self._data.pop(key, None)
+        return entry[1] if entry else None
+
+    def clear(self):
+        """Drop every entry"""
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        """Hit/miss counters and current size"""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+            }
@@ -0,0 +1,326 @@
+import itertools
+import threading
+import uuid
+import time
+from collections import deque
+from concurrent.futures import Future
+
+
+class DownloadJob:
+    """A single download queued for a worker"""
+
+    # Job statuses
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_COMPLETED = 'completed'
+    STATUS_FAILED = 'failed'
+
+    _sequence = itertools.count()
+
+    def __init__(self, func, args, kwargs, session_id=None, platform=None, admit=None):
+        self.job_id = str(uuid.uuid4())
+        self.session_id = session_id
+        self.platform = platform
+        self.admit = admit  # Returns what to start with (passed as admission=), or None to keep waiting
+        self.admission = None
+        self.seq = next(DownloadJob._sequence)  # Submission order across platforms
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.status = DownloadJob.STATUS_QUEUED
+        self.result = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._done = threading.Event()
+        self._callbacks = []
+        self._callback_lock = threading.Lock()
+
+    def is_done(self):
+        """Check if the job has finished (successfully or not)"""
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        """Block until the job finishes, returns the result dict"""
+        self._done.wait(timeout)
+        return self.result
+
+    def add_done_callback(self, callback):
+        """Call callback(job) once the job finishes (right away if it already has)"""
+        with self._callback_lock:
+            if not self._done.is_set():
+                self._callbacks.append(callback)
+                return
+        callback(self)
+
+    def finish(self, result):
+        """Store the result and wake up anyone waiting on the job"""
+        self.result = result
+        if result and result.get('status') == 'success':
+            self.status = DownloadJob.STATUS_COMPLETED
+        else:
+            self.status = DownloadJob.STATUS_FAILED
+        self.finished_at = time.time()
+
+        with self._callback_lock:
+            self._done.set()
+            callbacks, self._callbacks = self._callbacks, []
+
+        for callback in callbacks:
+            try:
+                callback(self)
+            except Exception as e:
+                print(f"⚠️ Job callback failed: {e}")
+
+    def to_dict(self):
+        """Public view of the job (for the status endpoint)"""
+        return {
+            'job_id': self.job_id,
+            'status': self.status,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'result': self.result
+        }
+
+
+class DownloadJobQueue:
+    """Bounded pool of worker threads that run queued downloads.
+
+    With a PlatformLimiter, pending jobs wait in per-platform queues and a free worker takes
+    the oldest job whose platform has a slot, so jobs for a saturated platform never hold a
+    worker (or the jobs queued behind them) while they wait. Jobs with an admit() check (e.g.
+    disk space) are only taken once it passes, or after admission_wait seconds with admission=None.
+    """
+
+    # How often jobs waiting for admission are checked again, besides wake()
+    ADMISSION_RECHECK = 5
+
+    def __init__(self, workers=4, max_pending=100, job_ttl=3600, name='download', limiter=None,
+                 admission_wait=120):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.job_ttl = job_ttl
+        self.limiter = limiter
+        self.admission_wait = admission_wait
+
+        self._pending = {}  # platform -> deque of jobs in submission order
+        self._pending_count = 0
+        self._waiting_admission = False
+        self._blocked_listeners = []
+        self._condition = threading.Condition()
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._active = 0
+        self._threads = []
+
+        for i in range(workers):
+            thread = threading.Thread(
+                target=self._worker,
+                name=f'{name}-worker-{i}',
+                daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+        if limiter:
+            limiter.subscribe(self.wake)
+
+        print(f"👷 {name.capitalize()} queue started ({workers} workers, {max_pending} max pending)")
+
+    def submit(self, func, *args, session_id=None, platform=None, admit=None, **kwargs):
+        """Queue a download, returns the job or None if the queue is full"""
+        self._prune_finished()
+
+        job = DownloadJob(func, args, kwargs, session_id=session_id, platform=platform, admit=admit)
+
+        with self._lock:
+            self._jobs[job.job_id] = job
+
+        with self._condition:
+            if self._pending_count < self.max_pending:
+                self._pending.setdefault(platform, deque()).append(job)
+                self._pending_count += 1
+                self._condition.notify()
+                return job
+
+        with self._lock:
+            self._jobs.pop(job.job_id, None)
+        return None
+
+    def get_job(self, job_id):
+        """Get a job by id"""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def active_count(self):
+        """Number of downloads currently running"""
+        return self._active
+
+    def queued_count(self):
+        """Number of downloads waiting for a worker"""
+        return self._pending_count
+
+    def subscribe_blocked(self, callback):
+        """Call callback(job) whenever a pending job finds its platform at the limit (condition held)"""
+        self._blocked_listeners.append(callback)
+
+    def wake(self):
+        """A platform slot or disk space freed up: let idle workers look for a job again"""
+        with self._condition:
+            self._condition.notify_all()
+
+    def _take(self):
+        """Oldest pending job with a free platform slot that passes admission, slot held (condition held)"""
+        self._waiting_admission = False
+        heads = sorted((jobs[0].seq, platform) for platform, jobs in self._pending.items())
+        for _, platform in heads:
+            jobs = self._pending[platform]
+            limited = self.limiter is not None and platform is not None
+            if limited and not self.limiter.try_acquire(platform):
+                for listener in self._blocked_listeners:
+                    listener(jobs[0])
+                continue
+            if not self._admit(jobs[0]):
+                if limited:
+                    # Only held for the check, so there's nobody new to wake
+                    self.limiter.release(platform, notify=False)
+                continue
+            job = jobs.popleft()
+            if not jobs:
+                del self._pending[platform]
+            self._pending_count -= 1
+            return job
+        return None
+
+    def _admit(self, job):
+        """Run a job's admission check; it gets in anyway (admission None) once it has waited too long"""
+        if job.admit is None:
+            return True
+        job.admission = job.admit()
+        if job.admission is not None or time.time() - job.created_at >= self.admission_wait:
+            return True
+        self._waiting_admission = True
+        return False
+
+    def _worker(self):
+        """Worker loop: take jobs off the queue and run them"""
+        while True:
+            with self._condition:
+                job = self._take()
+                while job is None:
+                    self._condition.wait(self.ADMISSION_RECHECK if self._waiting_admission else None)
+                    job = self._take()
+
+            with self._lock:
+                self._active += 1
+
+            job.status = DownloadJob.STATUS_RUNNING
+            job.started_at = time.time()
+
+            kwargs = job.kwargs
+            if job.admit is not None:
+                kwargs = dict(kwargs, admission=job.admission)
+
+            try:
+                result = job.func(*job.args, **kwargs)
+            except Exception as e:
+                print(f"❌ Job {job.job_id} crashed: {e}")
+                result = {'status': 'error', 'message': f'Server error: {str(e)}'}
+            finally:
+                # The platform slot covers the network phase, not a handed-off transcode
+                if self.limiter and job.platform is not None:
+                    self.limiter.release(job.platform)
+
+            if isinstance(result, Future):
+                # Handed off (e.g. to the transcode pool): the job stays running, this worker moves on
+                result.add_done_callback(lambda future, job=job: self._finish_handed_off(job, future))
+            else:
+                job.finish(result)
+
+            with self._lock:
+                self._active -= 1
+
+    @staticmethod
+    def _finish_handed_off(job, future):
+        """Finish a job whose result arrived later as a Future"""
+        try:
+            result = future.result()
+        except Exception as e:
+            print(f"❌ Job {job.job_id} crashed: {e}")
+            result = {'status': 'error', 'message': f'Server error: {str(e)}'}
+        job.finish(result)
+
+    def _prune_finished(self):
+        """Forget finished jobs older than the TTL"""
+        cutoff = time.time() - self.job_ttl
+
+        with self._lock:
+            stale = [
+                job_id for job_id, job in self._jobs.items()
+                if job.finished_at and job.finished_at < cutoff
+            ]
+            for job_id in stale:
+                del self._jobs[job_id]
+
+
+class PlatformLimiter:
+    """Caps how many downloads run at once for each platform (never blocks, see try_acquire)"""
+
+    # Default concurrent downloads per platform
+    DEFAULT_LIMITS = {
+        'youtube': 4,
+        'twitter': 3,
+        'reddit': 3,
+        'facebook': 2,
+        'tiktok': 2,
+        'instagram': 1,
+        'unknown': 2,
+    }
+
+    def __init__(self, limits=None, default_limit=2):
+        self.limits = dict(PlatformLimiter.DEFAULT_LIMITS)
+        if limits:
+            self.limits.update(limits)
+        self.default_limit = default_limit
+
+        self._running = {}  # platform -> downloads holding a slot
+        self._lock = threading.Lock()
+        self._listeners = []
+
+    @staticmethod
+    def parse_limits(spec):
+        """Parse a 'youtube=6,instagram=1' string into a limits dict"""
+        limits = {}
+        for item in (spec or '').split(','):
+            if '=' not in item:
+                continue
+            platform, limit = item.split('=', 1)
+            limits[platform.strip().lower()] = max(1, int(limit))
+        return limits
+
+    def limit(self, platform):
+        """Concurrent downloads allowed for a platform"""
+        return self.limits.get(platform, self.default_limit)
+
+    def try_acquire(self, platform):
+        """Take one of the platform's slots if one is free, returns whether it did"""
+        with self._lock:
+            running = self._running.get(platform, 0)
+            if running >= self.limit(platform):
+                return False
+            self._running[platform] = running + 1
+            return True
+
+    def release(self, platform, notify=True):
+        """Give a slot back and tell the queues waiting for one"""
+        with self._lock:
+            self._running[platform] -= 1
+        if not notify:
+            return
+        for listener in self._listeners:
+            listener()
+
+    def subscribe(self, callback):
+        """Call callback() whenever a slot frees up"""
+        self._listeners.append(callback)
@@ -0,0 +1,38 @@
+import importlib
+import threading
+
+
+class LazyModule:
+    """Stand-in for a heavy module that is only imported on first attribute access.
+
+    Python's import lock makes concurrent first accesses safe: one thread imports,
+    the others wait for it.
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+
+def warm_up(*modules):
+    """Import lazy modules on a background thread, so the first request doesn't pay for it"""
+    def load():
+        for module in modules:
+            module._load()
+        print(f"🔥 Warmed up: {', '.join(module._name for module in modules)}")
+
+    thread = threading.Thread(target=load, name='warm-up', daemon=True)
+    thread.start()
+    return thread
+
+
+# yt-dlp takes longer to import than the rest of the app combined
+yt_dlp = LazyModule('yt_dlp')
@@ -0,0 +1,25 @@
+import atexit
+import logging
+import logging.handlers
+import queue
+
+
+def configure_logging(level='INFO'):
+    """Route log records through a queue so download threads never block on stdout.
+
+    The calling thread only enqueues the record; a background listener does the actual write.
+    """
+    log_queue = queue.SimpleQueue()
+
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+
+    listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+
+    return listener
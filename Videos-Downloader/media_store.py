@@ -0,0 +1,151 @@
+import os
+import shutil
+import hashlib
+import threading
+import uuid
+from collections import OrderedDict
+
+
+def link_or_copy(src, dest):
+    """Hard link src to dest, copying if the filesystem can't link"""
+    try:
+        os.link(src, dest)
+    except FileExistsError:
+        raise
+    except OSError:
+        shutil.copy2(src, dest)
+
+
+class MediaStore:
+    """Shared store of finished downloads, hard-linked into session folders"""
+
+    def __init__(self, root, max_bytes=10 * 1024 ** 3):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+        self._entries = OrderedDict()  # key -> (filepath, size), least recently used first
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(root, exist_ok=True)
+        self._load_existing()
+
+    @staticmethod
+    def make_key(canonical_url, format_id, postprocess):
+        """Content key for a (URL, format, postprocessing) combination"""
+        raw = f"{canonical_url}|{format_id or 'default'}|{postprocess}"
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()[:32]
+
+    def _load_existing(self):
+        """Index entries left over from a previous run (oldest first)"""
+        found = []
+
+        for name in os.listdir(self.root):
+            entry_dir = os.path.join(self.root, name)
+
+            # Half-written entries from a crash
+            if name.startswith('.tmp-'):
+                shutil.rmtree(entry_dir, ignore_errors=True)
+                continue
+
+            files = os.listdir(entry_dir) if os.path.isdir(entry_dir) else []
+            if len(files) != 1:
+                shutil.rmtree(entry_dir, ignore_errors=True)
+                continue
+
+            filepath = os.path.join(entry_dir, files[0])
+            stat = os.stat(filepath)
+            found.append((stat.st_mtime, name, filepath, stat.st_size))
+
+        for _, key, filepath, size in sorted(found):
+            self._entries[key] = (filepath, size)
+            self._total_bytes += size
+
+        if found:
+            print(f"📦 Media store loaded {len(found)} entries ({self._total_bytes} bytes)")
+
+    def fetch(self, key, dest_folder):
+        """Link a stored file into dest_folder, returns the new path or None on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            filepath, _ = entry
+            dest = os.path.join(dest_folder, os.path.basename(filepath))
+
+            try:
+                # Linking under the lock so the entry can't be evicted halfway
+                if not (os.path.exists(dest) and os.path.samefile(filepath, dest)):
+                    link_or_copy(filepath, dest)
+            except OSError as e:
+                print(f"⚠️ Media store entry unusable, dropping it: {e}")
+                self._remove_entry(key)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+
+        return dest
+
+    def put(self, key, filepath):
+        """Add a finished download to the store (no-op if the key is already there)"""
+        with self._lock:
+            if key in self._entries:
+                return
+
+        # Stage the link in a private folder so readers never see a partial entry
+        tmp_dir = os.path.join(self.root, f'.tmp-{uuid.uuid4().hex}')
+        os.makedirs(tmp_dir)
+
+        try:
+            link_or_copy(filepath, os.path.join(tmp_dir, os.path.basename(filepath)))
+        except OSError as e:
+            print(f"⚠️ Could not add {filepath} to media store: {e}")
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            return
+
+        entry_dir = os.path.join(self.root, key)
+        size = os.path.getsize(filepath)
+
+        with self._lock:
+            if key in self._entries:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+                return
+
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            os.rename(tmp_dir, entry_dir)
+
+            self._entries[key] = (os.path.join(entry_dir, os.path.basename(filepath)), size)
+            self._total_bytes += size
+            self._evict()
+
+    def _evict(self):
+        """Drop least recently used entries until the store fits its budget (lock held)"""
+        while self._total_bytes > self.max_bytes and self._entries:
+            key = next(iter(self._entries))
+            self._remove_entry(key)
+            print(f"🗑️ Evicted media store entry: {key}")
+
+    def _remove_entry(self, key):
+        """Remove an entry from disk and the index (lock held)"""
+        filepath, size = self._entries.pop(key)
+        self._total_bytes -= size
+        # Session folders hold their own hard links, so they keep the data
+        shutil.rmtree(os.path.dirname(filepath), ignore_errors=True)
+
+    def stats(self):
+        """Store size and hit/miss counters"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._total_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
@@ -0,0 +1,200 @@
+import bisect
+import threading
+
+
+class _Sharded:
+    """Per-thread value dicts, so recording never takes a lock or contends with other threads.
+
+    Shards are only read (and dead threads' shards folded together) when metrics are scraped.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._shards = []  # (thread, {label values: value})
+        self._retired = {}
+        self._lock = threading.Lock()
+
+    def _shard(self):
+        try:
+            return self._local.values
+        except AttributeError:
+            values = self._local.values = {}
+            with self._lock:
+                self._shards.append((threading.current_thread(), values))
+            return values
+
+    def _snapshots(self):
+        """Copies of every shard, with shards of finished threads merged into one"""
+        with self._lock:
+            live = []
+            for thread, values in self._shards:
+                if thread.is_alive():
+                    live.append((thread, values))
+                else:
+                    # The thread is gone, so nothing writes to its shard any more
+                    for key, value in values.items():
+                        self._retired[key] = self._merge(self._retired.get(key), value)
+            self._shards = live
+            return [values.copy() for _, values in live] + [self._retired]
+
+    def _totals(self):
+        totals = {}
+        for snapshot in self._snapshots():
+            for key, value in snapshot.items():
+                totals[key] = self._merge(totals.get(key), value)
+        return totals
+
+
+class Counter(_Sharded):
+    """Monotonic counter"""
+
+    kind = 'counter'
+
+    def __init__(self, name, help, labelnames=(), registry=None):
+        super().__init__()
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        (registry or REGISTRY).register(self)
+
+    def inc(self, *label_values, amount=1):
+        values = self._shard()
+        values[label_values] = values.get(label_values, 0) + amount
+
+    @staticmethod
+    def _merge(total, value):
+        return (total or 0) + value
+
+    def samples(self):
+        for key, value in sorted(self._totals().items()):
+            yield self.name, dict(zip(self.labelnames, key)), value
+
+
+class Histogram(_Sharded):
+    """Distribution of observed values in fixed buckets"""
+
+    kind = 'histogram'
+
+    DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS, registry=None):
+        super().__init__()
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        (registry or REGISTRY).register(self)
+
+    def observe(self, value, *label_values):
+        values = self._shard()
+        counts = values.get(label_values)
+        if counts is None:
+            # One slot per bucket, one for +Inf, then the running sum
+            counts = values[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    @staticmethod
+    def _merge(total, value):
+        if total is None:
+            return list(value)
+        return [a + b for a, b in zip(total, value)]
+
+    def samples(self):
+        for key, counts in sorted(self._totals().items()):
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                yield f"{self.name}_bucket", dict(labels, le=_format_value(bound)), cumulative
+            yield f"{self.name}_sum", labels, counts[-1]
+            yield f"{self.name}_count", labels, cumulative
+
+
+class Callback:
+    """Value read from elsewhere at scrape time (queue lengths, session counts, totals kept by other objects).
+
+    func returns a number, or a dict of label value tuples to numbers.
+    """
+
+    def __init__(self, name, help, func, labelnames=(), kind='gauge', registry=None):
+        self.name = name
+        self.help = help
+        self.func = func
+        self.labelnames = tuple(labelnames)
+        self.kind = kind
+        (registry or REGISTRY).register(self)
+
+    def samples(self):
+        value = self.func()
+        if isinstance(value, dict):
+            for key, item in sorted(value.items()):
+                yield self.name, dict(zip(self.labelnames, key)), item
+        else:
+            yield self.name, {}, value
+
+
+class Registry:
+    """Set of metrics rendered together in Prometheus text format"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics[metric.name] = metric
+
+    def render(self):
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+REGISTRY = Registry()
+
+# Instruments shared by the app and the downloader
+REQUEST_SECONDS = Histogram(
+    'downloader_request_seconds', 'Time to answer /fetch-info and /download', ('route', 'platform'))
+FETCH_INFO_SECONDS = Histogram(
+    'downloader_fetch_info_seconds', 'Time to extract video info from the platform (cache misses)', ('platform',))
+DOWNLOAD_SECONDS = Histogram(
+    'downloader_download_seconds', 'Time from a download job starting to the file being ready', ('platform',))
+DOWNLOAD_BYTES = Counter(
+    'downloader_download_bytes_total', 'Bytes received from platforms/CDNs (rate() gives bytes per second)')
+POSTPROCESS_SECONDS = Histogram(
+    'downloader_postprocess_seconds', 'Time spent in yt-dlp postprocessors (ffmpeg merge/convert, file moves)', ('postprocessor',))
+MP4_FINALIZE = Counter(
+    'downloader_mp4_finalize_total', 'Downloads by how they were made into MP4 (skip, remux, transcode)', ('action',))
+TRANSCODE_SECONDS_SAVED = Counter(
+    'downloader_transcode_seconds_saved_total', 'Estimated ffmpeg time saved by remuxing instead of transcoding')
+COALESCED = Counter(
+    'downloader_coalesced_requests_total', 'Requests that joined an identical one already in flight', ('operation',))
+PREFETCHES = Counter(
+    'downloader_prefetches_total', 'Speculative downloads after fetch-info (started, skipped, attached, cancelled)', ('outcome',))
+ERRORS = Counter(
+    'downloader_errors_total', 'Failed requests by stage and error category', ('stage', 'category'))
@@ -0,0 +1,96 @@
+import time
+
+from yt_dlp.postprocessor.common import PostProcessor
+from yt_dlp.postprocessor.ffmpeg import FFmpegPostProcessor, FFmpegVideoConvertorPP
+
+# Codecs an MP4 container carries as-is (yt-dlp codec strings and ffprobe codec names)
+MP4_VIDEO_CODECS = ('avc1', 'avc3', 'h264', 'hev1', 'hvc1', 'h265', 'hevc', 'av01', 'av1', 'mp4v', 'mpeg4')
+MP4_AUDIO_CODECS = ('mp4a', 'aac', 'mp3', 'ac-3', 'ac3', 'ec-3', 'eac3')
+
+
+def _compatible(codec, allowed):
+    """True/False for a known codec, None when the extractor didn't say"""
+    if not codec or codec == 'unknown':
+        return None
+    codec = codec.lower()
+    return codec == 'none' or codec.startswith(allowed)
+
+
+class Mp4FinalizePP(FFmpegVideoConvertorPP):
+    """Get the download into an MP4 the cheapest way: leave it, remux (stream copy) or transcode.
+
+    Replaces an unconditional FFmpegVideoConvertor, which re-encoded every non-MP4 file even
+    when its streams could simply be copied into an MP4 container.
+    """
+
+    SKIP, REMUX, TRANSCODE = 'skip', 'remux', 'transcode'
+
+    def __init__(self, downloader=None, report=None, defer_transcode=False):
+        super().__init__(downloader, preferedformat='mp4')
+        self.report = report  # report(action, seconds, info) after each file
+        self.action = None
+        # Leave transcodes to the caller (a TranscodePool) instead of running ffmpeg on this thread
+        self.defer_transcode = defer_transcode
+        self.deferred = False
+
+    def choose_action(self, info):
+        """Pick skip/remux/transcode from the container and the codecs of the selected format"""
+        if info['ext'].lower() == 'mp4':
+            return self.SKIP
+
+        video = _compatible(info.get('vcodec'), MP4_VIDEO_CODECS)
+        audio = _compatible(info.get('acodec'), MP4_AUDIO_CODECS)
+        if None in (video, audio):
+            video, audio = self._probe_codecs(info['filepath'])
+
+        return self.REMUX if video and audio else self.TRANSCODE
+
+    def _probe_codecs(self, path):
+        """Ask ffprobe when the extractor didn't report codecs (transcode if that's not possible)"""
+        if not self.probe_available:
+            return False, False
+        try:
+            streams = self.get_metadata_object(path).get('streams', [])
+        except Exception as e:
+            self.report_warning(f'Could not probe codecs, transcoding: {e}')
+            return False, False
+
+        codecs = {kind: [s.get('codec_name') or '' for s in streams if s.get('codec_type') == kind]
+                  for kind in ('video', 'audio')}
+        return (all(_compatible(c, MP4_VIDEO_CODECS) for c in codecs['video']),
+                all(_compatible(c, MP4_AUDIO_CODECS) for c in codecs['audio']))
+
+    def _options(self, target_ext):
+        if self.action == self.REMUX:
+            return FFmpegPostProcessor.stream_copy_opts(ext=target_ext)
+        return super()._options(target_ext)
+
+    def transcode_command(self, source, target, threads):
+        """ffmpeg command line for a deferred transcode"""
+        return [
+            self.executable, '-y', '-nostdin', '-loglevel', 'error',
+            '-i', self._ffmpeg_filename_argument(source),
+            *self._options('mp4'), '-threads', str(threads),
+            self._ffmpeg_filename_argument(target),
+        ]
+
+    @PostProcessor._restrict_to(images=False)
+    def run(self, info):
+        started = time.perf_counter()
+        self.action = self.choose_action(info)
+        self._ACTION = 'remuxing' if self.action == self.REMUX else 'converting'
+
+        if self.action == self.TRANSCODE and self.defer_transcode:
+            # Fail here, like an inline conversion would, if there's no ffmpeg to hand off to
+            self.check_version()
+            self.deferred = True
+            return [], info
+
+        if self.action == self.SKIP:
+            files_to_delete = []
+        else:
+            files_to_delete, info = super().run(info)
+
+        if self.report:
+            self.report(self.action, time.perf_counter() - started, info)
+        return files_to_delete, info
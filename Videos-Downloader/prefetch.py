@@ -0,0 +1,311 @@
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import Future, wait
+
+from job_queue import DownloadJobQueue
+from metrics import PREFETCHES
+from session_manager import SessionManager
+from transcode_pool import chain
+
+
+class _Prefetch:
+    """One session's speculative download"""
+
+    __slots__ = ('key', 'platform', 'folder', 'cancel', 'future', 'started_at', 'running', 'holds_slot',
+                 'confirmed', 'abandoned', '_lock')
+
+    def __init__(self, key, platform, folder):
+        self.key = key  # Media store key of what's being downloaded
+        self.platform = platform
+        self.folder = folder
+        self.cancel = threading.Event()
+        self.future = Future()  # Result dict once the download has ended
+        self.started_at = time.time()
+        self.running = False
+        self.holds_slot = False  # In its network phase, with a platform slot
+        self.confirmed = False  # A /download attached: from now on it's a regular download
+        self.abandoned = False
+        self._lock = threading.Lock()
+
+    def begin(self):
+        """Start downloading, unless a /download already gave up on it"""
+        with self._lock:
+            self.running = not self.abandoned
+            return self.running
+
+    def abandon(self):
+        """Give up for lack of spare capacity, unless a /download has attached meanwhile"""
+        with self._lock:
+            self.abandoned = not self.confirmed
+            return self.abandoned
+
+    def confirm(self):
+        """Turn into a regular download for /download, if it's running and hasn't been given up"""
+        with self._lock:
+            if not self.running or self.abandoned:
+                # Not worth waiting for: make sure it never starts, the real download goes ahead
+                self.abandoned = True
+                return False
+            self.confirmed = True
+            return True
+
+
+class Prefetcher:
+    """Starts downloading the likely format as soon as fetch-info answers, before the user clicks.
+
+    Speculation only ever uses spare capacity: a small worker pool of its own, started only
+    while no confirmed download is waiting and the transcode pool is idle, a platform slot only
+    if one is free (skipped otherwise), spare rate-limit tokens only, disk space that is free
+    right now (nothing gets evicted for it) and files up to max_bytes. A confirmed download that
+    finds the platform at its limit cancels a prefetch holding a slot there. /download attaches
+    to it when the user picks that format, which makes it a regular download that no longer
+    gives up for lack of capacity, and cancels it otherwise.
+    """
+
+    # Subfolder of the session folder, so a cancelled prefetch can't touch the real download's files
+    FOLDER = '.prefetch'
+
+    # How long a download that changed its mind waits for the cancelled prefetch to stop
+    CANCEL_WAIT = 10
+
+    def __init__(self, downloader, download_queue, workers=1, max_pending=4, max_bytes=500 * 1024 ** 2,
+                 disk_budget=None, limiter=None, reaper=None):
+        self.downloader = downloader
+        self.download_queue = download_queue
+        self.limiter = limiter
+        self.reaper = reaper
+        self.max_bytes = max_bytes
+        self.disk_budget = disk_budget
+        self.queue = DownloadJobQueue(workers=workers, max_pending=max_pending, name='prefetch')
+
+        self._prefetches = {}  # session_id -> _Prefetch
+        self._lock = threading.Lock()
+
+        if limiter:
+            download_queue.subscribe_blocked(self.yield_slot)
+
+    @staticmethod
+    def likely_format(info):
+        """The format the page preselects: top of the quality list, else the default selector (None)"""
+        formats = info.get('formats')
+        if info.get('has_quality_options') and formats:
+            return formats[0]['format_id']
+        return None
+
+    def has_capacity(self):
+        """True while confirmed downloads aren't waiting for workers and no transcode is running"""
+        transcode_pool = self.downloader.transcode_pool
+        return (self.download_queue.queued_count() == 0
+                and self.download_queue.active_count() < self.download_queue.workers
+                and not (transcode_pool and (transcode_pool.active_count() or transcode_pool.queued_count())))
+
+    def start(self, session_id, url, info):
+        """Prefetch the likely format of what a session just fetched info for, if there's room"""
+        self._prune()
+        format_id = self.likely_format(info)
+        platform = self.downloader.detect_platform(url)
+        key = self.downloader.get_store_key(url, format_id, platform)
+
+        with self._lock:
+            previous = self._prefetches.get(session_id)
+        if previous is not None:
+            if previous.key == key:
+                return
+            # The session moved on to another video
+            self.cancel(session_id)
+
+        if SessionManager.get_state(session_id) != SessionManager.STATE_ACTIVE or not self.has_capacity():
+            PREFETCHES.inc('skipped')
+            return
+
+        estimate = self.downloader.estimate_download_size(url, format_id)
+        if not estimate or estimate > self.max_bytes:
+            PREFETCHES.inc('skipped')
+            return
+
+        reserved = 0
+        if self.disk_budget:
+            reserved = self.disk_budget.try_reserve(session_id, estimate)
+            if reserved is None:
+                PREFETCHES.inc('skipped')
+                return
+
+        folder = os.path.join(SessionManager.create_download_folder(session_id), self.FOLDER)
+        prefetch = _Prefetch(key, platform, folder)
+        with self._lock:
+            self._prefetches[session_id] = prefetch
+
+        job = self.queue.submit(self._run, prefetch, url, format_id, session_id, reserved, session_id=session_id)
+        if not job:
+            with self._lock:
+                self._prefetches.pop(session_id, None)
+            if self.disk_budget:
+                self.disk_budget.settle(session_id, reserved, folder)
+            PREFETCHES.inc('skipped')
+            return
+
+        PREFETCHES.inc('started')
+        print(f"🔮 Prefetching {url} (Format: {format_id}) for session {session_id}")
+
+    def _run(self, prefetch, url, format_id, session_id, reserved):
+        """Worker: the speculative download itself"""
+        result = {'status': 'cancelled', 'message': 'Download cancelled'}
+        platform = prefetch.platform
+        if prefetch.cancel.is_set():
+            return self._finish(prefetch, session_id, reserved, result)
+        # Confirmed downloads may have arrived while this waited; never wait for a platform slot either
+        if not self.has_capacity() or (self.limiter and not self.limiter.try_acquire(platform)):
+            PREFETCHES.inc('skipped')
+            return self._finish(prefetch, session_id, reserved, result)
+        if not prefetch.begin():
+            if self.limiter:
+                self.limiter.release(platform)
+            return self._finish(prefetch, session_id, reserved, result)
+
+        prefetch.holds_slot = True
+        try:
+            os.makedirs(prefetch.folder, exist_ok=True)
+            result = self.downloader.download_content(
+                url, prefetch.folder, session_id, format_id, hand_off=True,
+                cancel=prefetch.cancel, abandon=prefetch.abandon)
+        except Exception as e:
+            print(f"❌ Prefetch error: {str(e)}")
+            result = {'status': 'error', 'message': f'Server error: {str(e)}'}
+        finally:
+            # Like the download queue: the slot covers the network phase, not a handed-off transcode
+            prefetch.holds_slot = False
+            if self.limiter:
+                self.limiter.release(platform)
+
+        if isinstance(result, Future):
+            return chain(result, lambda transcode: self._finish(prefetch, session_id, reserved, transcode.result()))
+        return self._finish(prefetch, session_id, reserved, result)
+
+    def _finish(self, prefetch, session_id, reserved, result):
+        """Account for the prefetched file (or drop the partial one) and wake up whoever attached"""
+        if result['status'] == 'success':
+            if self.disk_budget:
+                self.disk_budget.settle(session_id, reserved, prefetch.folder, result['filepath'], result['filesize'])
+        else:
+            if self.disk_budget:
+                self.disk_budget.settle(session_id, reserved, prefetch.folder)
+            self._remove_folder(prefetch)
+
+        prefetch.future.set_result(result)
+        return result
+
+    def is_prefetching(self, session_id, url, format_id):
+        """True if the session's prefetch is of this download (so its disk space is already reserved)"""
+        key = self.downloader.get_store_key(url, format_id, self.downloader.detect_platform(url))
+        with self._lock:
+            prefetch = self._prefetches.get(session_id)
+        return prefetch is not None and prefetch.key == key
+
+    def claim(self, session_id, url, format_id):
+        """Hand a confirmed download its session's prefetch, if it's of the same thing.
+
+        Returns a Future of the result, with the file moved into the session folder, or None
+        (after cancelling a prefetch of something else, or finding a failed one).
+        """
+        with self._lock:
+            prefetch = self._prefetches.pop(session_id, None)
+        if prefetch is None:
+            return None
+
+        key = self.downloader.get_store_key(url, format_id, self.downloader.detect_platform(url))
+        if prefetch.key != key:
+            # Let it stop before the real download starts reporting progress for the session
+            self._cancel(session_id, prefetch)
+            wait([prefetch.future], timeout=self.CANCEL_WAIT)
+            return None
+
+        if prefetch.future.done():
+            result = prefetch.future.result()
+            if result['status'] != 'success' or not os.path.exists(result['filepath']):
+                self._discard(session_id, prefetch, result)
+                return None
+        elif not prefetch.confirm():
+            # Not started yet, or already giving up: a regular download is quicker
+            self._cancel(session_id, prefetch)
+            wait([prefetch.future], timeout=self.CANCEL_WAIT)
+            return None
+
+        PREFETCHES.inc('attached')
+        print(f"🔮 Attaching download to prefetch for session {session_id}")
+        return chain(prefetch.future, lambda done: self._adopt(session_id, prefetch, done.result()))
+
+    def _adopt(self, session_id, prefetch, result):
+        """Move the prefetched file into the session folder, where the real download would have put it"""
+        if result['status'] != 'success':
+            return result
+
+        filepath = os.path.join(os.path.dirname(prefetch.folder), result['filename'])
+        try:
+            os.replace(result['filepath'], filepath)
+        except OSError as e:
+            print(f"❌ Could not move prefetched file: {e}")
+            return {'status': 'error', 'message': 'Download failed, please try again'}
+        finally:
+            self._discard(session_id, prefetch, result)
+
+        return dict(result, filepath=filepath)
+
+    def cancel(self, session_id):
+        """Stop a session's prefetch (another video, a download of something else, or cleanup)"""
+        with self._lock:
+            prefetch = self._prefetches.pop(session_id, None)
+        if prefetch is not None:
+            self._cancel(session_id, prefetch)
+
+    def yield_slot(self, job):
+        """A confirmed download is waiting for a platform slot: cancel a prefetch holding one there.
+
+        The job's own session's prefetch is left alone, the job attaches to it (or cancels it) once it runs.
+        """
+        with self._lock:
+            session_id = next((session_id for session_id, prefetch in self._prefetches.items()
+                               if prefetch.platform == job.platform and prefetch.holds_slot
+                               and session_id != job.session_id), None)
+            prefetch = self._prefetches.pop(session_id, None)
+        if prefetch is not None:
+            print(f"🔮 Cancelling prefetch for session {session_id} to free a {job.platform} slot")
+            self._cancel(session_id, prefetch)
+
+    def _cancel(self, session_id, prefetch):
+        prefetch.cancel.set()
+        PREFETCHES.inc('cancelled')
+        # Whatever it managed to download goes once it has stopped
+        prefetch.future.add_done_callback(lambda done: self._discard(session_id, prefetch, done.result()))
+
+    def _discard(self, session_id, prefetch, result):
+        """Remove the prefetch folder and its file's share of the disk budget"""
+        if self.disk_budget and result['status'] == 'success':
+            self.disk_budget.discard(session_id, result['filepath'])
+        self._remove_folder(prefetch)
+
+    def _remove_folder(self, prefetch):
+        """Hand the prefetch folder to the reaper, or delete it right away without one"""
+        if self.reaper:
+            self.reaper.bury(prefetch.folder)
+        else:
+            shutil.rmtree(prefetch.folder, ignore_errors=True)
+
+    def _prune(self):
+        """Forget finished prefetches that were never claimed (their session has expired by now)"""
+        cutoff = time.time() - SessionManager.TIMEOUT_SECONDS
+        with self._lock:
+            stale = [
+                (session_id, prefetch) for session_id, prefetch in self._prefetches.items()
+                if prefetch.future.done() and prefetch.started_at < cutoff
+            ]
+            for session_id, _ in stale:
+                del self._prefetches[session_id]
+
+        for session_id, prefetch in stale:
+            self._discard(session_id, prefetch, prefetch.future.result())
+
+    def active_count(self):
+        """Prefetches downloading now"""
+        return self.queue.active_count()
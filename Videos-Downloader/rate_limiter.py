@@ -0,0 +1,164 @@
+import random
+import threading
+import time
+
+
+class TokenBucket:
+    """Token bucket that hands out reservations, so waiting callers are served in order"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def refill(self, now):
+        """Add the tokens earned since the last update"""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, now):
+        """Take a token (possibly going into debt), returns seconds until it's usable"""
+        self.refill(now)
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def refund(self):
+        """Give back a reservation that won't be used"""
+        self.tokens = min(self.burst, self.tokens + 1)
+
+
+class PlatformGovernor:
+    """Shared per-platform rate limit for upstream requests, with exponential backoff on HTTP 429"""
+
+    # (requests per second, burst) per platform
+    DEFAULT_RATES = {
+        'youtube': (3.0, 10),
+        'twitter': (1.0, 5),
+        'reddit': (1.0, 5),
+        'facebook': (0.5, 3),
+        'tiktok': (0.5, 3),
+        'instagram': (0.2, 2),
+        'unknown': (2.0, 5),
+    }
+
+    def __init__(self, rates=None, max_wait=60, backoff_base=5, backoff_max=300):
+        self.rates = dict(PlatformGovernor.DEFAULT_RATES)
+        if rates:
+            self.rates.update(rates)
+        self.max_wait = max_wait
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self._buckets = {}
+        self._strikes = {}  # platform -> consecutive 429s
+        self._blocked_until = {}  # platform -> monotonic time
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def parse_rates(spec):
+        """Parse an 'instagram=0.2:2,tiktok=0.5' string into a rates dict"""
+        rates = {}
+        for item in (spec or '').split(','):
+            if '=' not in item:
+                continue
+            platform, value = item.split('=', 1)
+            rate, _, burst = value.partition(':')
+            rates[platform.strip().lower()] = (float(rate), int(burst) if burst else max(1, int(float(rate) * 5)))
+        return rates
+
+    def _get_bucket(self, platform):
+        """Get (or lazily create) a platform's bucket (lock held)"""
+        bucket = self._buckets.get(platform)
+        if bucket is None:
+            rate, burst = self.rates.get(platform, self.rates['unknown'])
+            bucket = self._buckets[platform] = TokenBucket(rate, burst)
+        return bucket
+
+    def set_rate(self, platform, rate, burst=None):
+        """Change a platform's rate at runtime"""
+        with self._lock:
+            bucket = self._get_bucket(platform)
+            bucket.rate = rate
+            if burst is not None:
+                bucket.burst = burst
+            self.rates[platform] = (rate, bucket.burst)
+
+    def acquire(self, platform):
+        """Wait for permission to send one request to a platform.
+
+        Callers queue up rather than being rejected; returns False only if the wait
+        would be longer than max_wait.
+        """
+        platform = platform or 'unknown'
+
+        with self._lock:
+            now = time.monotonic()
+            bucket = self._get_bucket(platform)
+            wait = max(bucket.reserve(now), self._blocked_until.get(platform, 0) - now)
+
+            if wait > self.max_wait:
+                bucket.refund()
+                return False
+
+        while wait > 0:
+            time.sleep(wait)
+            # A 429 may have arrived while we were queued
+            wait = self._blocked_until.get(platform, 0) - time.monotonic()
+            if wait > self.max_wait:
+                return False
+
+        return True
+
+    def try_acquire_spare(self, platform, keep=0.5):
+        """Take a token only if it's spare right now, for optional (speculative) requests.
+
+        Never waits or goes into debt, and leaves at least `keep` of the burst to regular
+        callers, so they are never queued behind it. Returns whether it took one.
+        """
+        platform = platform or 'unknown'
+
+        with self._lock:
+            now = time.monotonic()
+            if self._blocked_until.get(platform, 0) > now:
+                return False
+            bucket = self._get_bucket(platform)
+            bucket.refill(now)
+            if bucket.tokens - 1 < bucket.burst * keep:
+                return False
+            bucket.tokens -= 1
+            return True
+
+    def report_rate_limited(self, platform):
+        """The platform answered 429: hold all its requests back, doubling the pause each time"""
+        platform = platform or 'unknown'
+        with self._lock:
+            strikes = self._strikes.get(platform, 0) + 1
+            self._strikes[platform] = strikes
+            delay = min(self.backoff_max, self.backoff_base * 2 ** (strikes - 1))
+            delay *= random.uniform(0.8, 1.2)  # Jitter, so queued callers don't all retry at once
+            self._blocked_until[platform] = max(self._blocked_until.get(platform, 0), time.monotonic() + delay)
+
+        print(f"🚦 {platform} rate limited us ({strikes}x in a row) - backing off {delay:.0f}s")
+
+    def report_success(self, platform):
+        """A request went through, reset the backoff"""
+        platform = platform or 'unknown'
+        if self._strikes.get(platform):
+            with self._lock:
+                self._strikes[platform] = 0
+
+    def stats(self):
+        """Current rate, backoff and token level per platform"""
+        with self._lock:
+            now = time.monotonic()
+            return {
+                platform: {
+                    'rate': bucket.rate,
+                    'burst': bucket.burst,
+                    'tokens': round(bucket.tokens, 2),
+                    'strikes': self._strikes.get(platform, 0),
+                    'backoff_seconds': round(max(0, self._blocked_until.get(platform, 0) - now), 1),
+                }
+                for platform, bucket in self._buckets.items()
+            }
@@ -0,0 +1,155 @@
+import os
+import shutil
+import threading
+import time
+import uuid
+
+
+class FolderReaper:
+    """Deferred folder deletion: rename into a graveyard now, delete in the background later.
+
+    The rename is atomic and instant on the same filesystem, so request handlers and the
+    cleanup job never wait on a big delete. The reaper thread unlinks file by file within
+    an I/O budget, so it doesn't starve downloads and file serving of disk bandwidth.
+    """
+
+    def __init__(self, graveyard, max_bytes_per_second=200 * 1024 * 1024, max_files_per_second=2000,
+                 rescan_seconds=30):
+        self.graveyard = graveyard
+        self.max_bytes_per_second = max_bytes_per_second
+        self.max_files_per_second = max_files_per_second
+        self.rescan_seconds = rescan_seconds
+
+        os.makedirs(graveyard, exist_ok=True)
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self.bytes_freed = 0
+        self.files_freed = 0
+        self.folders_reaped = 0
+
+    def start(self):
+        """Start the background reaper (also picks up anything a previous run left behind)"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='folder-reaper', daemon=True)
+            self._thread.start()
+            print(f"🪦 Folder reaper started ({self.max_bytes_per_second / 1024 ** 2:.0f} MB/s, "
+                  f"{self.max_files_per_second} files/s)")
+
+    def bury(self, folder_path):
+        """Move a folder into the graveyard for background deletion, returns True if it was moved"""
+        if not folder_path or not os.path.exists(folder_path):
+            return False
+
+        grave = os.path.join(self.graveyard, f"{uuid.uuid4().hex}-{os.path.basename(os.path.normpath(folder_path))}")
+        try:
+            os.rename(folder_path, grave)
+        except FileNotFoundError:
+            return False
+        except OSError as e:
+            # e.g. graveyard on another filesystem - fall back to deleting in place
+            print(f"⚠️ Could not move {folder_path} to graveyard ({e}), deleting now")
+            shutil.rmtree(folder_path, ignore_errors=True)
+            return True
+
+        self._wake.set()
+        return True
+
+    def _run(self):
+        while True:
+            self.reap()
+            self._wake.wait(self.rescan_seconds)
+            self._wake.clear()
+
+    def reap(self):
+        """Delete everything currently in the graveyard, within the I/O budget"""
+        try:
+            graves = os.listdir(self.graveyard)
+        except FileNotFoundError:
+            return
+
+        for name in graves:
+            grave = os.path.join(self.graveyard, name)
+            started = time.monotonic()
+            files, freed = self._reap_tree(grave, started)
+            if files or freed:
+                print(f"🪦 Reaped {name}: {files} files, {freed / 1024 ** 2:.1f} MB freed "
+                      f"in {time.monotonic() - started:.1f}s")
+
+    def _reap_tree(self, grave, started):
+        """Unlink one buried folder bottom-up, returns (files, bytes) freed"""
+        files = 0
+        freed = 0
+
+        if not os.path.isdir(grave) or os.path.islink(grave):
+            # A stray file in the graveyard
+            files, freed = self._unlink(grave)
+            self._account(files, freed)
+            return files, freed
+
+        for root, dirs, filenames in os.walk(grave, topdown=False):
+            for filename in filenames:
+                count, size = self._unlink(os.path.join(root, filename))
+                files += count
+                freed += size
+                self._account(count, size)
+                self._throttle(started, files, freed)
+            for dirname in dirs:
+                path = os.path.join(root, dirname)
+                try:
+                    if os.path.islink(path):
+                        os.unlink(path)
+                    else:
+                        os.rmdir(path)
+                except OSError:
+                    pass
+
+        try:
+            os.rmdir(grave)
+        except OSError:
+            # Another worker process may be reaping the same grave
+            pass
+
+        with self._lock:
+            self.folders_reaped += 1
+        return files, freed
+
+    @staticmethod
+    def _unlink(path):
+        """Delete one file, returns (1, bytes freed) or (0, 0) if it was already gone"""
+        try:
+            stat = os.lstat(path)
+            os.unlink(path)
+            # A hard link into the media store (or another session) frees nothing until the last link goes
+            return 1, stat.st_size if stat.st_nlink == 1 else 0
+        except FileNotFoundError:
+            return 0, 0
+        except OSError as e:
+            print(f"❌ Reaper could not delete {path}: {e}")
+            return 0, 0
+
+    def _account(self, files, freed):
+        with self._lock:
+            self.files_freed += files
+            self.bytes_freed += freed
+
+    def _throttle(self, started, files, freed):
+        """Sleep whenever this pass is ahead of its byte or file budget"""
+        budget_seconds = max(freed / self.max_bytes_per_second, files / self.max_files_per_second)
+        ahead = budget_seconds - (time.monotonic() - started)
+        if ahead > 0:
+            time.sleep(ahead)
+
+    def stats(self):
+        """Totals freed since startup and graves still waiting"""
+        try:
+            pending = len(os.listdir(self.graveyard))
+        except FileNotFoundError:
+            pending = 0
+        with self._lock:
+            return {
+                'bytes_freed': self.bytes_freed,
+                'files_freed': self.files_freed,
+                'folders_reaped': self.folders_reaped,
+                'pending': pending,
+            }
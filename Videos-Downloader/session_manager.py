@@ -2,72 +2,110 @@ import os
 import uuid
 import time
 import shutil
-from datetime import datetime, timedelta
 from flask import session
-import json
+from session_store import MemorySessionStore, SessionRecord, SessionState
 
 class SessionManager:
     """Manages user sessions and their download folders"""
     
     # Session states
-    STATE_ACTIVE = 'ACTIVE'
-    STATE_DOWNLOADING = 'DOWNLOADING'
-    STATE_COMPLETED = 'COMPLETED'
-    STATE_EXPIRED = 'EXPIRED'
+    STATE_ACTIVE = SessionState.ACTIVE
+    STATE_DOWNLOADING = SessionState.DOWNLOADING
+    STATE_COMPLETED = SessionState.COMPLETED
+    STATE_EXPIRED = SessionState.EXPIRED
     
     # Session timeout (10 minutes)
     TIMEOUT_SECONDS = 600
     
-    # In-memory storage (use Redis in production)
-    _sessions = {}
+    # Session storage backend (swap for RedisSessionStore with configure_store)
+    _store = MemorySessionStore()
+    
+    # Background deletion of session folders (see configure_reaper); None deletes inline
+    _reaper = None
+    
+    # Byte accounting for session folders (see configure_disk_budget)
+    _disk_budget = None
+    
+    @staticmethod
+    def configure_store(store):
+        """Use a different session storage backend"""
+        SessionManager._store = store
+    
+    @staticmethod
+    def configure_reaper(reaper):
+        """Hand folder deletion to a FolderReaper instead of deleting inline"""
+        SessionManager._reaper = reaper
+    
+    @staticmethod
+    def configure_disk_budget(disk_budget):
+        """Release a session's DiskBudget accounting whenever its folder is deleted"""
+        SessionManager._disk_budget = disk_budget
+    
+    @staticmethod
+    def _schedule_timeout(session_id, timeout_at):
+        """Put the session's new deadline (epoch seconds) in the store's expiry index"""
+        SessionManager._store.schedule_expiry(session_id, timeout_at)
     
     @staticmethod
     def create_session():
         """Create a new session"""
         session_id = str(uuid.uuid4())
-        
-        session_data = {
-            'session_id': session_id,
-            'state': SessionManager. STATE_ACTIVE,
-            'created_at': datetime.now().isoformat(),
-            'last_activity': datetime.now().isoformat(),
-            'download_folder': None,
-            'downloads': [],
-            'timeout_at': (datetime.now() + timedelta(seconds=SessionManager.TIMEOUT_SECONDS)).isoformat()
-        }
-        
-        SessionManager._sessions[session_id] = session_data
+        now = time.time()
+        timeout_at = now + SessionManager.TIMEOUT_SECONDS
+        
+        session_data = SessionRecord(
+            session_id,
+            state=SessionManager.STATE_ACTIVE,
+            created_at=now,
+            last_activity=now,
+            timeout_at=timeout_at
+        )
+        
+        SessionManager._store.save(session_id, session_data)
+        SessionManager._schedule_timeout(session_id, timeout_at)
         session['session_id'] = session_id
         
         return session_id
     
     @staticmethod
     def get_session(session_id):
-        """Get session data"""
-        return SessionManager._sessions. get(session_id)
+        """Get session data (a SessionRecord copy, or None)"""
+        return SessionManager._store.get(session_id)
     
     @staticmethod
     def update_activity(session_id):
         """Update last activity timestamp"""
-        if session_id in SessionManager._sessions:
-            SessionManager._sessions[session_id]['last_activity'] = datetime.now().isoformat()
+        session_data = SessionManager.get_session(session_id)
+        if session_data:
+            now = time.time()
+            fields = {'last_activity': now}
+            timeout_at = None
             # Reset timeout if state is ACTIVE
-            if SessionManager._sessions[session_id]['state'] == SessionManager.STATE_ACTIVE:
-                SessionManager._sessions[session_id]['timeout_at'] = (
-                    datetime.now() + timedelta(seconds=SessionManager. TIMEOUT_SECONDS)
-                ).isoformat()
+            if session_data.state == SessionManager.STATE_ACTIVE:
+                timeout_at = now + SessionManager.TIMEOUT_SECONDS
+                fields['timeout_at'] = timeout_at
+            SessionManager._store.update(session_id, fields)
+            if timeout_at:
+                SessionManager._schedule_timeout(session_id, timeout_at)
     
     @staticmethod
     def set_state(session_id, state):
         """Set session state"""
-        if session_id in SessionManager._sessions:
-            SessionManager._sessions[session_id]['state'] = state
+        SessionManager._store.update(session_id, {'state': state})
+    
+    @staticmethod
+    def compare_and_set_state(session_id, expected_states, state):
+        """Atomically change state only if it's currently one of expected_states.
+        
+        Returns the previous state, or None if the session was in another state.
+        """
+        return SessionManager._store.compare_and_set_state(session_id, expected_states, state)
     
     @staticmethod
     def get_state(session_id):
         """Get session state"""
         session_data = SessionManager. get_session(session_id)
-        return session_data['state'] if session_data else None
+        return session_data.state if session_data else None
     
     @staticmethod
     def create_download_folder(session_id):
@@ -75,16 +113,14 @@ class SessionManager:
         folder_path = os.path.join('downloads', session_id)
         os.makedirs(folder_path, exist_ok=True)
         
-        if session_id in SessionManager._sessions:
-            SessionManager._sessions[session_id]['download_folder'] = folder_path
+        SessionManager._store.update(session_id, {'download_folder': folder_path})
         
         return folder_path
     
     @staticmethod
     def add_download(session_id, download_info):
         """Add download info to session"""
-        if session_id in SessionManager._sessions:
-            SessionManager._sessions[session_id]['downloads'].append(download_info)
+        SessionManager._store.append_download(session_id, download_info)
     
     @staticmethod
     def cleanup_session(session_id, force=False):
@@ -94,78 +130,111 @@ class SessionManager:
         if not session_data:
             return
         
-        # Check if download is in progress
-        state = session_data['state']
+        if force:
+            SessionManager.set_state(session_id, SessionManager.STATE_EXPIRED)
         
-        if state == SessionManager.STATE_DOWNLOADING and not force:
+        # Claim the session first, so a download starting right now can't have its folder deleted
+        elif not SessionManager.compare_and_set_state(
+            session_id,
+            [SessionManager.STATE_ACTIVE, SessionManager.STATE_COMPLETED, SessionManager.STATE_EXPIRED],
+            SessionManager.STATE_EXPIRED
+        ):
             # Don't cleanup during download unless forced
             return False
         
-        # Delete folder
-        folder_path = session_data. get('download_folder')
+        # Nothing left for the scheduler to expire, and it stops counting as live
+        SessionManager._store.cancel_expiry(session_id)
+        
+        # Delete folder (read again now that the session is ours, it may have changed meanwhile)
+        session_data = SessionManager.get_session(session_id) or session_data
+        SessionManager._delete_folder(session_data.download_folder)
+        if SessionManager._disk_budget:
+            SessionManager._disk_budget.release(session_id)
+        
+        return True
+    
+    @staticmethod
+    def _delete_folder(folder_path):
+        """Delete a session's download folder"""
         if folder_path and os.path.exists(folder_path):
             try:
-                shutil.rmtree(folder_path)
+                if SessionManager._reaper:
+                    # Instant rename; the reaper deletes the files in the background
+                    SessionManager._reaper.bury(folder_path)
+                else:
+                    shutil.rmtree(folder_path)
                 print(f"✅ Cleaned up folder: {folder_path}")
             except Exception as e:
                 print(f"❌ Error cleaning folder {folder_path}: {e}")
-        
-        # Set state to expired
-        SessionManager.set_state(session_id, SessionManager. STATE_EXPIRED)
-        
-        return True
     
     @staticmethod
-    def reset_session(session_id):
+    def reset_session(session_id, state=None):
         """Reset session after download completion (for reuse)"""
         session_data = SessionManager.get_session(session_id)
         
         if not session_data: 
             return False
         
-        # Cleanup old folder
-        SessionManager.cleanup_session(session_id, force=True)
+        # Cleanup old folder (without passing through EXPIRED, so the state never flickers)
+        SessionManager._delete_folder(session_data.download_folder)
+        if SessionManager._disk_budget:
+            SessionManager._disk_budget.release(session_id)
         
         # Reset session data
-        SessionManager._sessions[session_id]. update({
-            'state': SessionManager.STATE_ACTIVE,
-            'last_activity': datetime.now().isoformat(),
+        now = time.time()
+        timeout_at = now + SessionManager.TIMEOUT_SECONDS
+        SessionManager._store.update(session_id, {
+            'state': state or SessionManager.STATE_ACTIVE,
+            'last_activity': now,
             'download_folder': None,
-            'downloads': [],
-            'timeout_at': (datetime.now() + timedelta(seconds=SessionManager.TIMEOUT_SECONDS)).isoformat()
+            'downloads': (),
+            'timeout_at': timeout_at
         })
+        SessionManager._schedule_timeout(session_id, timeout_at)
         
         return True
     
     @staticmethod
     def extend_timeout(session_id, minutes=10):
         """Extend session timeout (for active downloads)"""
-        if session_id in SessionManager._sessions:
-            new_timeout = datetime.now() + timedelta(minutes=minutes)
-            SessionManager._sessions[session_id]['timeout_at'] = new_timeout.isoformat()
+        new_timeout = time.time() + minutes * 60
+        if SessionManager._store.update(session_id, {'timeout_at': new_timeout}):
+            SessionManager._schedule_timeout(session_id, new_timeout)
             print(f"⏰ Extended timeout for session {session_id} by {minutes} minutes")
     
+    @staticmethod
+    def defer_cleanup(session_id, seconds):
+        """Let the cleanup scheduler remove the session `seconds` from now"""
+        cleanup_at = time.time() + seconds
+        if SessionManager._store.update(session_id, {'timeout_at': cleanup_at}):
+            SessionManager._schedule_timeout(session_id, cleanup_at)
+    
     @staticmethod
     def get_expired_sessions():
-        """Get list of expired sessions"""
+        """Get list of expired sessions (only looks at sessions whose deadline has passed)"""
         expired = []
-        now = datetime.now()
         
-        for session_id, data in SessionManager._sessions.items():
-            timeout_at = datetime.fromisoformat(data['timeout_at'])
-            state = data['state']
-            
-            # Expire if timeout reached and not downloading
-            if now > timeout_at and state != SessionManager.STATE_DOWNLOADING:
-                expired.append(session_id)
+        for session_id in SessionManager._store.pop_due(time.time()):
+            data = SessionManager.get_session(session_id)
+            if not data:
+                continue
             
             # Extend timeout if downloading
-            elif now > timeout_at and state == SessionManager.STATE_DOWNLOADING: 
+            if data.state == SessionManager.STATE_DOWNLOADING: 
                 SessionManager.extend_timeout(session_id, minutes=10)
+            
+            # Expire if timeout reached and not downloading
+            else:
+                expired.append(session_id)
         
         return expired
     
+    @staticmethod
+    def count_live_sessions():
+        """Sessions that haven't been cleaned up yet (cheap, for metrics)"""
+        return SessionManager._store.live_count()
+    
     @staticmethod
     def get_all_sessions():
         """Get all sessions (for debugging)"""
-        return SessionManager._sessions
\ No newline at end of file
+        return SessionManager._store.all()
\ No newline at end of file
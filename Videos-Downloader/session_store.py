@@ -0,0 +1,320 @@
+import heapq
+import json
+import threading
+from enum import Enum
+
+
+class SessionState(str, Enum):
+    """Session lifecycle states (a str, so they compare equal to and serialize as their names)"""
+
+    ACTIVE = 'ACTIVE'
+    DOWNLOADING = 'DOWNLOADING'
+    COMPLETED = 'COMPLETED'
+    EXPIRED = 'EXPIRED'
+
+    def __str__(self):
+        return self.value
+
+
+class SessionRecord:
+    """One session. Slotted, with epoch-second floats for timestamps, because idle sessions add up.
+
+    downloads is a tuple, so copies can share it.
+    """
+
+    FIELDS = ('session_id', 'state', 'created_at', 'last_activity', 'download_folder', 'downloads', 'timeout_at')
+
+    __slots__ = FIELDS
+
+    def __init__(self, session_id, state=SessionState.ACTIVE, created_at=0.0, last_activity=0.0,
+                 download_folder=None, downloads=(), timeout_at=0.0):
+        self.session_id = session_id
+        self.state = state
+        self.created_at = created_at
+        self.last_activity = last_activity
+        self.download_folder = download_folder
+        self.downloads = downloads
+        self.timeout_at = timeout_at
+
+    def copy(self):
+        return SessionRecord(*(getattr(self, field) for field in self.FIELDS))
+
+    def update(self, fields):
+        for key, value in fields.items():
+            setattr(self, key, value)
+
+
+class _Stripe:
+    """One shard of the memory store: its sessions, their expiry index and the lock guarding both"""
+
+    __slots__ = ('lock', 'sessions', 'expiry_heap', 'deadlines')
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sessions = {}
+
+        # Expiry index: min-heap of (deadline, session_id) plus the live deadline per session.
+        # Rescheduling just pushes a new entry; outdated heap entries are skipped when popped.
+        self.expiry_heap = []
+        self.deadlines = {}
+
+
+class MemorySessionStore:
+    """In-process session storage (single worker only).
+
+    Sessions are spread over lock stripes by id, so concurrent requests for different
+    sessions rarely wait on each other and the cleanup thread never blocks every route.
+    """
+
+    def __init__(self, stripes=32):
+        self._stripes = [_Stripe() for _ in range(stripes)]
+
+    def _stripe(self, session_id):
+        return self._stripes[hash(session_id) % len(self._stripes)]
+
+    def get(self, session_id):
+        """Get a copy of a session record, or None"""
+        stripe = self._stripe(session_id)
+        with stripe.lock:
+            record = stripe.sessions.get(session_id)
+            return record.copy() if record else None
+
+    def save(self, session_id, record):
+        """Create or replace a session"""
+        stripe = self._stripe(session_id)
+        # Copied, so callers can't change stored state by accident
+        record = record.copy()
+        with stripe.lock:
+            stripe.sessions[session_id] = record
+
+    def update(self, session_id, fields):
+        """Update some fields of an existing session, returns False if it doesn't exist"""
+        stripe = self._stripe(session_id)
+        with stripe.lock:
+            record = stripe.sessions.get(session_id)
+            if record is None:
+                return False
+            record.update(fields)
+            return True
+
+    def append_download(self, session_id, download_info):
+        """Add an entry to the session's downloads list"""
+        stripe = self._stripe(session_id)
+        with stripe.lock:
+            record = stripe.sessions.get(session_id)
+            if record is not None:
+                record.downloads += (download_info,)
+
+    def compare_and_set_state(self, session_id, expected_states, new_state):
+        """Atomically move to new_state if the current state is one of expected_states.
+
+        Returns the previous state on success, None otherwise.
+        """
+        stripe = self._stripe(session_id)
+        with stripe.lock:
+            record = stripe.sessions.get(session_id)
+            if record is None or record.state not in expected_states:
+                return None
+            previous = record.state
+            record.state = new_state
+            return previous
+
+    def all(self):
+        """Snapshot of every session"""
+        sessions = {}
+        for stripe in self._stripes:
+            with stripe.lock:
+                sessions.update((session_id, record.copy()) for session_id, record in stripe.sessions.items())
+        return sessions
+
+    def schedule_expiry(self, session_id, deadline):
+        """Set (or move) a session's expiry deadline (epoch seconds)"""
+        stripe = self._stripe(session_id)
+        with stripe.lock:
+            stripe.deadlines[session_id] = deadline
+            heapq.heappush(stripe.expiry_heap, (deadline, session_id))
+
+            # Rebuild once outdated entries dominate the heap
+            if len(stripe.expiry_heap) > 2 * len(stripe.deadlines) + 64:
+                stripe.expiry_heap = [(d, sid) for sid, d in stripe.deadlines.items()]
+                heapq.heapify(stripe.expiry_heap)
+
+    def cancel_expiry(self, session_id):
+        """Drop a session's deadline (it has been cleaned up already)"""
+        stripe = self._stripe(session_id)
+        with stripe.lock:
+            # Its heap entry is now outdated and gets skipped by pop_due
+            stripe.deadlines.pop(session_id, None)
+
+    def pop_due(self, now, limit=1000):
+        """Remove and return up to `limit` sessions whose deadline has passed"""
+        due = []
+        # One stripe at a time, so requests only ever wait for a single stripe's worth of popping
+        for stripe in self._stripes:
+            with stripe.lock:
+                heap = stripe.expiry_heap
+                while heap and heap[0][0] <= now and len(due) < limit:
+                    deadline, session_id = heapq.heappop(heap)
+                    if stripe.deadlines.get(session_id) == deadline:
+                        del stripe.deadlines[session_id]
+                        due.append(session_id)
+            if len(due) >= limit:
+                break
+        return due
+
+    def live_count(self):
+        """Number of sessions with a pending expiry deadline (not yet cleaned up)"""
+        # len() of a dict is atomic, no need to stop the stripes
+        return sum(len(stripe.deadlines) for stripe in self._stripes)
+
+
+class RedisSessionStore:
+    """Redis-backed session storage, shared by every worker process and host"""
+
+    KEY_PREFIX = 'session:'
+    EXPIRY_KEY = 'sessions:expiry'
+
+    # Atomic state transition: KEYS[1] = session hash, ARGV[1] = new state, ARGV[2..] = expected states
+    CAS_SCRIPT = """
+    local state = redis.call('HGET', KEYS[1], 'state')
+    if not state then
+        return false
+    end
+    for i = 2, #ARGV do
+        if state == ARGV[i] then
+            redis.call('HSET', KEYS[1], 'state', ARGV[1])
+            return state
+        end
+    end
+    return false
+    """
+
+    # Pop due sessions from the expiry index: KEYS[1] = sorted set, ARGV[1] = now, ARGV[2] = limit
+    POP_DUE_SCRIPT = """
+    local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+    if #due > 0 then
+        redis.call('ZREM', KEYS[1], unpack(due))
+    end
+    return due
+    """
+
+    def __init__(self, url='redis://localhost:6379/0', client=None, key_ttl=86400):
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(url, decode_responses=True)
+
+        self.client = client
+        self.key_ttl = key_ttl
+        self._cas = client.register_script(self.CAS_SCRIPT)
+        self._pop_due = client.register_script(self.POP_DUE_SCRIPT)
+
+    def _key(self, session_id):
+        return f"{self.KEY_PREFIX}{session_id}"
+
+    def _downloads_key(self, session_id):
+        return f"{self.KEY_PREFIX}{session_id}:downloads"
+
+    @staticmethod
+    def _encode(fields):
+        """Redis hashes only hold strings"""
+        encoded = {}
+        for key, value in fields.items():
+            if key == 'downloads':
+                continue
+            encoded[key] = json.dumps(value)
+        return encoded
+
+    @staticmethod
+    def _decode(raw, downloads):
+        fields = {key: json.loads(value) for key, value in raw.items() if key in SessionRecord.FIELDS}
+        fields['state'] = SessionState(fields['state'])
+        fields['downloads'] = tuple(json.loads(item) for item in downloads)
+        return SessionRecord(**fields)
+
+    def get(self, session_id):
+        """Get a session record, or None"""
+        pipe = self.client.pipeline()
+        pipe.hgetall(self._key(session_id))
+        pipe.lrange(self._downloads_key(session_id), 0, -1)
+        raw, downloads = pipe.execute()
+        return self._decode(raw, downloads) if raw else None
+
+    def save(self, session_id, record):
+        """Create or replace a session"""
+        key = self._key(session_id)
+        downloads_key = self._downloads_key(session_id)
+
+        pipe = self.client.pipeline()
+        pipe.delete(key, downloads_key)
+        pipe.hset(key, mapping=self._encode({field: getattr(record, field) for field in SessionRecord.FIELDS}))
+        if record.downloads:
+            pipe.rpush(downloads_key, *[json.dumps(item) for item in record.downloads])
+        pipe.expire(key, self.key_ttl)
+        pipe.expire(downloads_key, self.key_ttl)
+        pipe.execute()
+
+    def update(self, session_id, fields):
+        """Update some fields of an existing session, returns False if it doesn't exist"""
+        key = self._key(session_id)
+        downloads_key = self._downloads_key(session_id)
+
+        if not self.client.exists(key):
+            return False
+
+        pipe = self.client.pipeline()
+        encoded = self._encode(fields)
+        if encoded:
+            pipe.hset(key, mapping=encoded)
+        if 'downloads' in fields:
+            pipe.delete(downloads_key)
+            if fields['downloads']:
+                pipe.rpush(downloads_key, *[json.dumps(item) for item in fields['downloads']])
+        pipe.expire(key, self.key_ttl)
+        pipe.expire(downloads_key, self.key_ttl)
+        pipe.execute()
+        return True
+
+    def append_download(self, session_id, download_info):
+        """Add an entry to the session's downloads list"""
+        if self.client.exists(self._key(session_id)):
+            downloads_key = self._downloads_key(session_id)
+            self.client.rpush(downloads_key, json.dumps(download_info))
+            self.client.expire(downloads_key, self.key_ttl)
+
+    def compare_and_set_state(self, session_id, expected_states, new_state):
+        """Atomically move to new_state if the current state is one of expected_states.
+
+        Returns the previous state on success, None otherwise.
+        """
+        expected = [json.dumps(state) for state in expected_states]
+        previous = self._cas(keys=[self._key(session_id)], args=[json.dumps(new_state)] + expected)
+        return SessionState(json.loads(previous)) if previous else None
+
+    def all(self):
+        """Snapshot of every session"""
+        sessions = {}
+        for key in self.client.scan_iter(match=f"{self.KEY_PREFIX}*"):
+            if key.endswith(':downloads'):
+                continue
+            session_id = key[len(self.KEY_PREFIX):]
+            record = self.get(session_id)
+            if record:
+                sessions[session_id] = record
+        return sessions
+
+    def schedule_expiry(self, session_id, deadline):
+        """Set (or move) a session's expiry deadline (epoch seconds)"""
+        self.client.zadd(self.EXPIRY_KEY, {session_id: deadline})
+
+    def cancel_expiry(self, session_id):
+        """Drop a session's deadline (it has been cleaned up already)"""
+        self.client.zrem(self.EXPIRY_KEY, session_id)
+
+    def pop_due(self, now, limit=1000):
+        """Remove and return up to `limit` sessions whose deadline has passed"""
+        # Atomic, so two workers never both clean up the same session
+        return list(self._pop_due(keys=[self.EXPIRY_KEY], args=[now, limit]))
+    
+    def live_count(self):
+        """Number of sessions with a pending expiry deadline (not yet cleaned up)"""
+        return self.client.zcard(self.EXPIRY_KEY)
@@ -0,0 +1,68 @@
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    """Coalesces identical concurrent calls: one runs, the others wait for it and share the result.
+
+    Unlike a cache, nothing is kept once the call finishes; later calls run again (or hit
+    whatever cache the caller fills).
+    """
+
+    def __init__(self):
+        self._flights = {}  # key -> Future of the running call's result
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.shared = 0
+
+    def run(self, key, func, lead=True):
+        """Call func() unless a call with the same key is already in flight.
+
+        Returns (result, shared). The caller that runs func gets its return value and False;
+        callers arriving while it runs get a Future of that value and True. If func returns
+        a Future, the flight lasts until that Future completes.
+
+        With lead=False the call joins a running flight but doesn't start one, for calls that
+        may be abandoned (nobody else should end up waiting on them).
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                self.shared += 1
+                return flight, True
+            self.calls += 1
+            if lead:
+                flight = self._flights[key] = Future()
+
+        if not lead:
+            return func(), False
+
+        try:
+            result = func()
+        except BaseException as e:
+            self._land(key, flight, exception=e)
+            raise
+
+        if isinstance(result, Future):
+            result.add_done_callback(lambda done: self._land(key, flight, done=done))
+        else:
+            self._land(key, flight, result=result)
+        return result, False
+
+    def _land(self, key, flight, result=None, exception=None, done=None):
+        """Hand the outcome to everyone waiting; new calls after this start a fresh flight"""
+        with self._lock:
+            self._flights.pop(key, None)
+
+        if done is not None:
+            exception = done.exception()
+            result = None if exception else done.result()
+        if exception is not None:
+            flight.set_exception(exception)
+        else:
+            flight.set_result(result)
+
+    def stats(self):
+        """Calls run vs. calls that joined one already running"""
+        with self._lock:
+            return {'in_flight': len(self._flights), 'calls': self.calls, 'shared': self.shared}
@@ -0,0 +1,129 @@
+import os
+import queue
+import subprocess
+import threading
+import time
+from concurrent.futures import Future
+
+
+class TranscodeError(Exception):
+    """ffmpeg failed, timed out or couldn't be started"""
+
+
+def chain(future, func):
+    """Future for func(finished_future), called on whichever thread completes `future`"""
+    chained = Future()
+
+    def done(finished):
+        try:
+            chained.set_result(func(finished))
+        except Exception as e:
+            chained.set_exception(e)
+
+    future.add_done_callback(done)
+    return chained
+
+
+class TranscodePool:
+    """Fixed set of workers running ffmpeg transcodes at lower OS priority.
+
+    Sized to the CPU: each job gets threads_per_job encoder threads and there are as many
+    workers as that fits in the cores, so a burst of conversions can't starve the request
+    threads. Downloads hand their transcode off here once the network phase is done.
+    """
+
+    def __init__(self, workers=None, threads_per_job=2, max_pending=32, timeout=900, niceness=10):
+        cores = os.cpu_count() or 1
+        self.threads_per_job = max(1, min(threads_per_job, cores))
+        self.workers = workers or max(1, cores // self.threads_per_job)
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.niceness = niceness
+
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._active = 0
+        self._lock = threading.Lock()
+        self.completed = 0
+        self.failed = 0
+
+        for i in range(self.workers):
+            threading.Thread(target=self._worker, name=f'transcode-worker-{i}', daemon=True).start()
+
+        print(f"🎞️ Transcode pool started ({self.workers} workers x {self.threads_per_job} threads, "
+              f"{max_pending} max pending)")
+
+    def submit(self, command, timeout=None):
+        """Queue an ffmpeg command line, returns a Future (of the seconds it took) or None if the queue is full"""
+        future = Future()
+        try:
+            self._queue.put_nowait((command, timeout or self.timeout, future))
+        except queue.Full:
+            return None
+        return future
+
+    def active_count(self):
+        """Transcodes running now"""
+        return self._active
+
+    def queued_count(self):
+        """Transcodes waiting for a worker"""
+        return self._queue.qsize()
+
+    def _worker(self):
+        """Worker loop: run queued commands one at a time"""
+        while True:
+            command, timeout, future = self._queue.get()
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            with self._lock:
+                self._active += 1
+            started = time.perf_counter()
+            try:
+                self._run(command, timeout)
+            except Exception as e:
+                with self._lock:
+                    self.failed += 1
+                future.set_exception(e if isinstance(e, TranscodeError) else TranscodeError(str(e)))
+            else:
+                with self._lock:
+                    self.completed += 1
+                future.set_result(time.perf_counter() - started)
+            finally:
+                with self._lock:
+                    self._active -= 1
+
+    def _run(self, command, timeout):
+        """Run one ffmpeg process to completion (or kill it at the timeout)"""
+        process = subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                                   stderr=subprocess.PIPE, text=True, errors='replace')
+        self._lower_priority(process.pid)
+        try:
+            _, stderr = process.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.communicate()
+            raise TranscodeError(f'ffmpeg timed out after {timeout}s')
+
+        if process.returncode != 0:
+            lines = stderr.strip().splitlines()
+            raise TranscodeError(f"ffmpeg exited with {process.returncode}: {lines[-1] if lines else 'no output'}")
+
+    def _lower_priority(self, pid):
+        """Let request threads win the CPU over ffmpeg (Unix only)"""
+        if not self.niceness or not hasattr(os, 'setpriority'):
+            return
+        try:
+            os.setpriority(os.PRIO_PROCESS, pid, self.niceness)
+        except OSError as e:
+            print(f"⚠️ Could not lower ffmpeg priority: {e}")
+
+    def stats(self):
+        """Counters for monitoring"""
+        return {
+            'workers': self.workers,
+            'active': self._active,
+            'queued': self._queue.qsize(),
+            'completed': self.completed,
+            'failed': self.failed,
+        }
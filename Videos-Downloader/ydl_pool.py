@@ -0,0 +1,124 @@
+import threading
+from contextlib import contextmanager
+
+from lazy_import import yt_dlp
+
+
+class YoutubeDLPool:
+    """Warm YoutubeDL instances, kept idle per option set and handed out one caller at a time.
+
+    Building a YoutubeDL loads the extractor list, processes every option and sets up the
+    cookie jar and request handlers; reusing one skips all that and keeps its HTTP
+    keep-alive connections to the platform APIs and CDNs.
+    """
+
+    # Options that change on every request; applied on checkout instead of being part of the key
+    PER_USE_OPTIONS = ('outtmpl', 'format', 'progress_hooks')
+
+    def __init__(self, max_idle_per_key=4):
+        self.max_idle_per_key = max_idle_per_key
+        self._idle = {}  # option key -> [YoutubeDL]
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+
+    @classmethod
+    def _key(cls, opts):
+        """Identify an option set (our option dicts are built in a fixed order, so repr is stable)"""
+        return repr(sorted((name, value) for name, value in opts.items() if name not in cls.PER_USE_OPTIONS))
+
+    def _create(self, opts):
+        """Build a new instance with the shared part of the options"""
+        ydl = yt_dlp.YoutubeDL({name: value for name, value in opts.items() if name not in self.PER_USE_OPTIONS})
+        # Remember the option set's own postprocessors so extras can be dropped on release
+        ydl._pool_pp_counts = {when: len(pps) for when, pps in ydl._pps.items()}
+        ydl._pool_format = None
+        return ydl
+
+    @staticmethod
+    def _prepare(ydl, opts):
+        """Apply the per-request options"""
+        outtmpl = opts.get('outtmpl')
+        ydl.params['outtmpl'] = {'default': outtmpl} if outtmpl else {}
+        ydl._parse_outtmpl()
+
+        # The format selector is only rebuilt when the format string changes
+        format_spec = opts.get('format')
+        ydl.params['format'] = format_spec
+        if format_spec != ydl._pool_format:
+            ydl.format_selector = (
+                format_spec if format_spec in (None, '-') or callable(format_spec)
+                else ydl.build_format_selector(format_spec))
+            ydl._pool_format = format_spec
+
+        ydl._progress_hooks = list(opts.get('progress_hooks', []))
+
+    @staticmethod
+    def _reset(ydl):
+        """Clear per-request state so the next caller starts clean"""
+        ydl._progress_hooks = []
+        ydl._num_downloads = 0
+        ydl._download_retcode = 0
+        ydl._playlist_level = 0
+        ydl._playlist_urls.clear()
+        for when, pps in ydl._pps.items():
+            del pps[ydl._pool_pp_counts.get(when, 0):]
+
+    @contextmanager
+    def get(self, opts):
+        """Check out an instance configured with opts, returning it to the pool afterwards"""
+        key = self._key(opts)
+
+        with self._lock:
+            idle = self._idle.get(key)
+            ydl = idle.pop() if idle else None
+            if ydl is None:
+                self.created += 1
+            else:
+                self.reused += 1
+
+        if ydl is None:
+            ydl = self._create(opts)
+
+        reusable = False
+        try:
+            self._prepare(ydl, opts)
+            yield ydl
+            reusable = True
+        except yt_dlp.utils.DownloadError:
+            # Extraction/download failures are reported cleanly and leave the instance usable
+            reusable = True
+            raise
+        finally:
+            if reusable:
+                self._release(key, ydl)
+            else:
+                ydl.close()
+
+    def _release(self, key, ydl):
+        """Put an instance back, or close it if enough are already idle"""
+        self._reset(ydl)
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle_per_key:
+                idle.append(ydl)
+                return
+        ydl.close()
+
+    def close(self):
+        """Close every idle instance (and its connections)"""
+        with self._lock:
+            instances = [ydl for idle in self._idle.values() for ydl in idle]
+            self._idle.clear()
+        for ydl in instances:
+            ydl.close()
+
+    def stats(self):
+        """Pool usage counters"""
+        with self._lock:
+            return {
+                'option_sets': len(self._idle),
+                'idle': sum(len(idle) for idle in self._idle.values()),
+                'created': self.created,
+                'reused': self.reused,
+            }
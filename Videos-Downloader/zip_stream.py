@@ -0,0 +1,70 @@
+import io
+import zipfile
+
+# Read/yield size while copying a file into the archive
+CHUNK_SIZE = 1024 * 1024
+
+
+class _ZipSink(io.RawIOBase):
+    """Write-only, unseekable buffer that zipfile writes into and the generator drains.
+
+    Because it can't seek, zipfile writes sizes/CRCs in data descriptors after each entry,
+    so nothing has to be buffered or rewritten.
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def seekable(self):
+        return False
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        """Take everything written since the last drain"""
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_zip(entries):
+    """Generate a store-mode (uncompressed) ZIP on the fly.
+
+    entries yields (arcname, filepath) or (arcname, bytes) pairs; it may block, e.g.
+    while waiting for the next download to finish. Memory use is one chunk, whatever
+    the archive size.
+    """
+    sink = _ZipSink()
+
+    with zipfile.ZipFile(sink, mode='w', compression=zipfile.ZIP_STORED) as archive:
+        for arcname, source in entries:
+            if isinstance(source, bytes):
+                archive.writestr(arcname, source)
+                yield sink.drain()
+                continue
+
+            info = zipfile.ZipInfo.from_file(source, arcname)
+            info.compress_type = zipfile.ZIP_STORED
+
+            with open(source, 'rb') as src, archive.open(info, mode='w', force_zip64=True) as dest:
+                while True:
+                    chunk = src.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    dest.write(chunk)
+                    yield sink.drain()
+
+            yield sink.drain()
+
+    # Central directory
+    yield sink.drain()